@@ -19,7 +19,7 @@ setuptools.setup(
     packages=setuptools.find_packages("src"),
     package_dir={'': 'src'},
     package_data={
-        "": ["data/*.json"]
+        "": ["data/*.json", "data/*.json.gz"]
     },
     classifiers=[
         "Programming Language :: Python :: 3",
@@ -26,6 +26,7 @@ from .filesystem import *
 from .module_types import *
 from .module_geolocate import *
 from .module_GDAL2Numpy import *
+from .module_raster import Raster
 from .module_Numpy2GTiff import *
 from .module_meta import *
 from .module_ogr import *
@@ -35,10 +36,11 @@ from .module_geojson import ShapeFileFromGeoJSON
 from .module_s3 import *
 from .module_http import *
 from .module_open import get
-from .rasterlike import RasterLike
+from .module_pool import DatasetPool
+from .rasterlike import RasterLike, RasterLikeMany
 from .rasterizelike import RasterizeLike
 from .module_gdal import *
-from .gdalwarp import gdalwarp
+from .gdalwarp import gdalwarp, WarpToArray
 from .gdal_translate import gdal_translate
 from .gdal_merge import gdal_merge
 from .module_log import *
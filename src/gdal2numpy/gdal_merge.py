@@ -23,60 +23,146 @@
 # Created:     07/10/2024
 # -----------------------------------------------------------------------------
 import os
-import inspect
 import numpy as np
-from osgeo import gdal, gdalconst
-from .module_s3 import copy, move
-from .filesystem import tempfilename, forceext, justpath, listify
+from osgeo import gdal
+from .module_s3 import move, GDALPaths, VSICache
+from .filesystem import tempfilename, justpath, listify
 from .filesystem import remove
+from .module_GDAL2Numpy import resampling_method
+from .module_meta import compute_statistics
+from .module_tiles import tile_windows, tile_bbox
 from .module_log import Logger
 
 
-def average(in_ar, out_ar, xoff, yoff, xsize, ysize, raster_xsize, raster_ysize, buf_radius, gt, **kwargs):
+def merge_window(gt, bbox):
     """
-    average - average the input arrays
+    merge_window - the (xoff, yoff, xsize, ysize) pixel window of bbox on the grid gt
     """
-    nodata_value = -9999.0
-    # Initialize the output array with NoData value
-    # tmp = np.empty_like(out_ar)
-    # tmp.fill(nodata_value)
-    # for arr in in_ar:
-    #     arr[np.isnan(arr)] = nodata_value
-    #     tmp[tmp == nodata_value] = arr[tmp == nodata_value]
-    # out_ar[:] = tmp[:]
-
-    out_ar.fill(nodata_value)
-    for arr in in_ar:
-        arr[np.isnan(arr)] = nodata_value
-        out_ar[out_ar == nodata_value] = arr[out_ar == nodata_value]
-
-resampling_function_text = f'''<VRTRasterBand dataType="Float32" band="1" subClass="VRTDerivedRasterBand">
-    <PixelFunctionType>average</PixelFunctionType>
-    <PixelFunctionLanguage>Python</PixelFunctionLanguage>
-    <PixelFunctionCode><![CDATA[
-import numpy as np
+    x0, px, _, y0, _, py = gt
+    minx, miny, maxx, maxy = bbox
+    j0, j1 = round((minx - x0) / px), round((maxx - x0) / px)
+    i0, i1 = sorted((round((maxy - y0) / py), round((miny - y0) / py)))
+    return j0, i0, j1 - j0, i1 - i0
 
-{inspect.getsource(average)}
-]]>
-    </PixelFunctionCode>
-'''
 
+class MergeIndex:
+    """
+    MergeIndex - the footprints of the inputs of gdal_merge, queried with a
+    vectorized bounding box test
+    """
 
-def gdal_merge(filelist, fileout, format="GTiff"):
+    def __init__(self, filelist):
+        self.inputs = []
+        self.counts = []
+        boxes = []
+        for filename in filelist:
+            # the GDALPaths can be /vsis3/, /vsicurl/ or a vrt, not only .tif
+            try:
+                ds = gdal.Open(filename)
+            except RuntimeError:
+                ds = None
+            if not ds:
+                Logger.warning(f"gdal_merge: unable to open {filename}")
+                continue
+            band = ds.GetRasterBand(1)
+            gt = ds.GetGeoTransform()
+            m, n = ds.RasterYSize, ds.RasterXSize
+            minx, maxx = sorted((gt[0], gt[0] + n * gt[1]))
+            miny, maxy = sorted((gt[3], gt[3] + m * gt[5]))
+            nodata = band.GetNoDataValue()
+            self.inputs.append((ds, band, gt, -9999.0 if nodata is None else nodata))
+            self.counts.append(ds.RasterCount)
+            boxes.append((minx, miny, maxx, maxy))
+        self.boxes = np.array(boxes, dtype=np.float64).reshape(-1, 4)
+
+    def query(self, bbox):
+        """
+        query - the indices, in input order, of the footprints intersecting bbox
+        """
+        minx, miny, maxx, maxy = bbox
+        b = self.boxes
+        hits = (b[:, 0] < maxx) & (b[:, 2] > minx) & (b[:, 1] < maxy) & (b[:, 3] > miny)
+        return np.flatnonzero(hits)
+
+    def close(self):
+        """
+        close - release the datasets
+        """
+        self.inputs = []
+
+
+def merge_tile(index, ids, bbox, gt, rows, cols, method, nodata, resampleAlg):
     """
-    gdal_merge
+    merge_tile - combine the inputs ids overlapping bbox into a rows x cols tile
+    """
+    tile = np.full((rows, cols), np.nan, dtype=np.float32)
+    if method in ("mean", "average"):
+        sums = np.zeros((rows, cols), dtype=np.float64)
+        counts = np.zeros((rows, cols), dtype=np.uint32)
+
+    j0, i0, _, _ = merge_window(gt, bbox)
+    for k in ids:
+        ds, band, igt, inodata = index.inputs[k]
+        # the intersection of the tile with the input, in tile and input pixels
+        b = index.boxes[k]
+        ibox = max(bbox[0], b[0]), max(bbox[1], b[1]), min(bbox[2], b[2]), min(bbox[3], b[3])
+        tx, ty, tcols, trows = merge_window(gt, ibox)
+        tx, ty = tx - j0, ty - i0
+        tcols, trows = min(tcols, cols - tx), min(trows, rows - ty)
+        xoff, yoff, xsize, ysize = merge_window(igt, ibox)
+        xsize, ysize = xsize + min(xoff, 0), ysize + min(yoff, 0)
+        xoff, yoff = max(xoff, 0), max(yoff, 0)
+        xsize, ysize = min(xsize, ds.RasterXSize - xoff), min(ysize, ds.RasterYSize - yoff)
+        if xsize <= 0 or ysize <= 0 or tcols <= 0 or trows <= 0:
+            continue
+        arr = band.ReadAsArray(xoff, yoff, xsize, ysize, buf_xsize=tcols, buf_ysize=trows,
+                               resample_alg=resampleAlg).astype(np.float32, copy=False)
+        # the nodata mask is computed once per input
+        arr[(arr == inodata) | np.isnan(arr)] = np.nan
+        sub = tile[ty:ty + trows, tx:tx + tcols]
+        if method == "first":
+            np.copyto(sub, arr, where=np.isnan(sub))
+        elif method == "last":
+            np.copyto(sub, arr, where=~np.isnan(arr))
+        elif method == "min":
+            np.fmin(sub, arr, out=sub)
+        elif method == "max":
+            np.fmax(sub, arr, out=sub)
+        else:
+            valid = ~np.isnan(arr)
+            sums[ty:ty + trows, tx:tx + tcols][valid] += arr[valid]
+            counts[ty:ty + trows, tx:tx + tcols] += valid
+
+    if method in ("mean", "average"):
+        np.divide(sums, counts, out=tile, where=counts > 0, casting="unsafe")
+    tile[np.isnan(tile)] = nodata
+    return tile
+
+
+def gdal_merge(filelist, fileout, format="GTiff", method="first", tilesize=2048, resampleAlg="average",
+               vsi_cache=None):
+    """
+    gdal_merge - mosaic the filelist tile by tile: each tile of the output
+    grid reads just the inputs it overlaps and combines them with numpy
+    :param filelist: single band rasters, local, s3, http or vrt
+    :param method: first, last, min, max or mean (the nodata aware average)
+    :param tilesize: the size of the tiles of the output grid
+    :param resampleAlg: the resampling of the inputs with a different resolution
+    :param vsi_cache: the size in bytes of the block cache of the remote inputs, read in place
     """
     filetmp = tempfilename(prefix="gdal_merge/tmp_", suffix=".tif")
     tmpdir = justpath(filetmp)
+    os.makedirs(tmpdir, exist_ok=True)
 
     fileout = fileout or filetmp
+    method = method.lower() if method else "first"
+    if method not in ("first", "last", "min", "max", "mean", "average"):
+        Logger.error(f"gdal_merge: unknown method {method}")
+        return None
 
-    # copy the filelist into a temporary directory
+    # read the inputs in place, s3 and http files with range reads
     filelist = listify(filelist)
-    filelist_tmp = copy(filelist, tmpdir)
-
-    filevrt = forceext(fileout, "vrt")
-    os.makedirs(tmpdir, exist_ok=True)
+    filelist_tmp, copies = GDALPaths(filelist, tmpdir)
 
     co = {
         "gtiff": ["BIGTIFF=YES", "TILED=YES", "BLOCKXSIZE=512", "BLOCKYSIZE=512", "COMPRESS=LZW"],
@@ -84,47 +170,62 @@ def gdal_merge(filelist, fileout, format="GTiff"):
     }
 
     format = format.lower() or "gtiff"
-
-    creation_options = co.get(format, [])
-
-    ds = gdal.BuildVRT(filevrt, filelist_tmp, **{"srcNodata": -9999})
-    ds.FlushCache()
-    del ds
-
-    # read the filevrt file
-    content = ""
-    with open(filevrt, "r", encoding="utf-8") as f:
-        content = f.read()
-        content = content.replace(
-            '<VRTRasterBand dataType="Float32" band="1">', resampling_function_text)
-    # write the filevrt file
-    with open(filevrt, "w", encoding="utf-8") as f:
-        f.write(content)
-
-    kwargs = {
-        "format": format,
-        "creationOptions": creation_options,
-        "resampleAlg": gdalconst.GRIORA_Average,
-        "noData": -9999,
-        "stats": True,
-    }
-
-    try:
-        gdal.UseExceptions()
-        gdal.PushErrorHandler('CPLQuietErrorHandler')
-        gdal.SetConfigOption("GDAL_VRT_ENABLE_PYTHON", "YES")
-        gdal.Translate(filetmp, filevrt, **kwargs)
-    except Exception as ex:
-        Logger.error(ex)
-    finally:
-        gdal.SetConfigOption("GDAL_VRT_ENABLE_PYTHON", "")
-        gdal.PopErrorHandler()
+    nodata = -9999
+
+    band, ds, index, merged = None, None, None, False
+    with VSICache(vsi_cache):
+        try:
+            gdal.UseExceptions()
+            gdal.PushErrorHandler('CPLQuietErrorHandler')
+            # the mosaic grid, extent and resolution, as gdalbuildvrt computes it
+            vrt = gdal.BuildVRT("", filelist_tmp)
+            gt, prj = vrt.GetGeoTransform(), vrt.GetProjection()
+            m, n = vrt.RasterYSize, vrt.RasterXSize
+            vrt = None
+
+            index = MergeIndex(filelist_tmp)
+            if max(index.counts, default=1) > 1:
+                raise ValueError("gdal_merge: the inputs must have a single band")
+            filetif = filetmp if format == "gtiff" else tempfilename(prefix="gdal_merge/tmp_", suffix=".tif")
+            driver = gdal.GetDriverByName("GTiff")
+            ds = driver.Create(filetif, n, m, 1, gdal.GDT_Float32, co["gtiff"])
+            ds.SetGeoTransform(gt)
+            ds.SetProjection(prj)
+            band = ds.GetRasterBand(1)
+            band.SetNoDataValue(nodata)
+
+            for window in tile_windows(m, n, tilesize):
+                j0, i0, cols, rows = window
+                bbox = tile_bbox(gt, window)
+                ids = index.query(bbox)
+                if len(ids):
+                    tile = merge_tile(index, ids, bbox, gt, rows, cols, method, nodata,
+                                      resampling_method(resampleAlg))
+                    band.WriteArray(tile, j0, i0)
+            compute_statistics(band)
+            # flush and close the GTiff before it is translated or moved
+            band, ds = None, None
+
+            if filetif != filetmp:
+                gdal.Translate(filetmp, filetif, format=format, creationOptions=co.get(format, []))
+                remove(filetif)
+            merged = True
+        except Exception as ex:
+            Logger.error(ex)
+        finally:
+            band, ds = None, None
+            if index:
+                index.close()
+            gdal.PopErrorHandler()
+
+    # cleanup the inputs copied
+    remove(copies)
+
+    if not merged:
+        remove(filetmp)
+        return None
 
     # move the filetmp to s3 or locally
     move(filetmp, fileout)
 
-    # cleanup
-    filelist_tmp.append(filevrt)
-    remove(filelist_tmp)
-
     return fileout
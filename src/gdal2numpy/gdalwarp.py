@@ -23,32 +23,93 @@
 # Created:     16/06/2021
 # -------------------------------------------------------------------------------
 import os
-from osgeo import gdal, gdalconst
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from osgeo import gdal
 from .filesystem import juststem, tempfilename, listify
 from .module_ogr import SameSpatialRef, GetSpatialRef
 from .module_meta import GetNoData, GDALFixNoData
 from .module_s3 import *
 from .gdal_translate import dtypeOf
+from .module_GDAL2Numpy import resampling_method, translate_nodata
+from .module_tiles import worker_init, tile_windows, tile_bbox
 from .module_log import Logger
 
 
-def resampling_method(method):
+def warp_task(filelist, filetile, window, gt, prj, kwargs):
     """
-    reasampling_method translation form text to gdalconst
+    warp_task - warp a single output tile in a worker process
+    :return: filetile or None
     """
-    algorithms = {
-        "near": gdalconst.GRIORA_NearestNeighbour,
-        "bilinear": gdalconst.GRIORA_Bilinear,
-        "cubic": gdalconst.GRIORA_Cubic,
-        "cubicspline": gdalconst.GRIORA_CubicSpline,
-        "lanczos": gdalconst.GRIORA_Lanczos,
-        "average": gdalconst.GRIORA_Average,
-        "rms": gdalconst.GRIORA_RMS,
-        "mode": gdalconst.GRIORA_Mode,
-        "gauss": gdalconst.GRIORA_Gauss,
-    }
-    method = method.lower() if isinstance(method, str) else None
-    return algorithms.get(method, gdalconst.GRIORA_NearestNeighbour)
+    _, _, cols, rows = window
+    try:
+        gdal.UseExceptions()
+        # the tile is closed as soon as the returned dataset is released
+        gdal.Warp(filetile, filelist, format="GTiff",
+                  creationOptions=["BIGTIFF=YES", "TILED=YES", "BLOCKXSIZE=512", "BLOCKYSIZE=512"],
+                  outputBounds=tile_bbox(gt, window), width=cols, height=rows, dstSRS=prj,
+                  **kwargs)
+        return filetile
+    except Exception as ex:
+        Logger.error(f"gdalwarp: tile {window}: {ex}")
+    return None
+
+
+def WarpTiles(filelist, fileout, kwargs, format="GTiff", tilesize=4096, workers=4, cachemax=256):
+    """
+    WarpTiles - warp the output grid tile by tile, each tile in its own worker
+    process, then assemble the tiles into fileout
+    :param kwargs: the gdal.Warp options of the whole output
+    :param format: GTiff, COG or VRT, the VRT references the tiles kept in <fileout>_tiles/
+    :param cachemax: the GDAL block cache of each worker in MB
+    """
+    format = format.lower() if format else "gtiff"
+    # the output grid, a warped VRT is computed without reading any pixel
+    options = {key: value for key, value in kwargs.items()
+               if key not in ("format", "creationOptions", "multithread")}
+    grid = gdal.Warp("", filelist, format="VRT", **options)
+    if grid is None:
+        return None
+    m, n = grid.RasterYSize, grid.RasterXSize
+    gt, prj = grid.GetGeoTransform(), grid.GetProjection()
+    grid = None
+
+    # each tile is cut on the grid, so the bounds and the resolution are fixed
+    for key in ("xRes", "yRes", "outputBounds", "cropToCutline", "dstSRS", "multithread"):
+        options.pop(key, None)
+    # the approximated transformer is linearized over each tile, the exact one
+    # gives the same pixels whatever the tiling
+    options.setdefault("errorThreshold", 0)
+
+    tiledir = forceext(fileout, "") + "_tiles" if format == "vrt" else tempdir(f"gdalwarp/{juststem(fileout)}_tiles")
+    os.makedirs(tiledir, exist_ok=True)
+    windows = list(tile_windows(m, n, tilesize))
+    filetiles = [f"{tiledir}/tile_{i0}_{j0}.tif" for j0, i0, _, _ in windows]
+    with ProcessPoolExecutor(max_workers=workers, initializer=worker_init, initargs=(cachemax,)) as executor:
+        futures = [executor.submit(warp_task, filelist, filetile, window, gt, prj, options)
+                   for filetile, window in zip(filetiles, windows)]
+        filetiles = [future.result() for future in futures]
+
+    if None in filetiles:
+        remove(tiledir)
+        return None
+
+    if format == "vrt":
+        if gdal.BuildVRT(fileout, filetiles) is None:
+            remove(tiledir)
+            return None
+        return fileout
+
+    # compress the assembled tiles with all the cpus
+    filevrt = f"{tiledir}/tiles.vrt"
+    co = ["BIGTIFF=YES", "TILED=YES", "BLOCKXSIZE=512", "BLOCKYSIZE=512", "COMPRESS=LZW", "NUM_THREADS=ALL_CPUS"] \
+        if format == "gtiff" else ["BIGTIFF=YES", "COMPRESS=LZW", "NUM_THREADS=ALL_CPUS"]
+    # each dataset is closed by the time the comparison returns
+    done = gdal.BuildVRT(filevrt, filetiles) is not None and \
+        gdal.Translate(fileout, filevrt, format=format, creationOptions=co) is not None
+    # the tiles, the vrt and the folder itself
+    remove(tiledir)
+    return fileout if done else None
 
 
 def gdalwarp(filelist,
@@ -60,9 +121,22 @@ def gdalwarp(filelist,
              resampleAlg="near",
              format="GTiff",
              ot=None,
-             dstNodata=None):
+             dstNodata=None,
+             vsi_cache=None,
+             tilesize=None,
+             workers=1,
+             cachemax=256,
+             return_array=False,
+             dtype=np.float32,
+             load_nodata_as=np.nan):
     """
     gdalwarp
+    :param vsi_cache: the size in bytes of the block cache of the remote inputs, read in place
+    :param workers: warp the output grid in tiles of tilesize pixels with a pool
+        of worker processes (see WarpTiles), format can also be VRT
+    :param cachemax: the GDAL block cache of each worker in MB
+    :param return_array: warp in memory and return (data, gt, prj) instead of
+        writing fileout, the nodata values are loaded as load_nodata_as
     """
 
     t0 = now()
@@ -73,19 +147,27 @@ def gdalwarp(filelist,
         return None
 
     co = {
-        "gtiff": ["BIGTIFF=YES", "TILED=YES", "BLOCKXSIZE=512", "BLOCKYSIZE=512", "COMPRESS=LZW"],
-        "cog":   ["BIGTIFF=YES", "COMPRESS=LZW"],
+        "gtiff": ["BIGTIFF=YES", "TILED=YES", "BLOCKXSIZE=512", "BLOCKYSIZE=512", "COMPRESS=LZW", "NUM_THREADS=ALL_CPUS"],
+        "cog":   ["BIGTIFF=YES", "COMPRESS=LZW", "NUM_THREADS=ALL_CPUS"],
     }
 
     format = format.lower() if format else "gtiff"
+    if return_array:
+        return WarpToArray(filelist, dstSRS=dstSRS, cutline=cutline, cropToCutline=cropToCutline,
+                           pixelsize=pixelsize, resampleAlg=resampleAlg, ot=ot, dstNodata=dstNodata,
+                           vsi_cache=vsi_cache, dtype=dtype, load_nodata_as=load_nodata_as)
 
     filetmp = tempfilename(prefix="gdalwarp/tmp_", suffix=".tif")
     # inplace gdalwarp, give the fileout as the first file in the list
     if fileout is None and len(filelist) > 0:
         fileout = filelist[0]
     fileout = fileout if fileout else filetmp
+    # the VRT of the tiles references them by relative path, so it is not moved
+    if format == "vrt" and workers and workers > 1:
+        filetmp = fileout
 
-    filelist_tmp = copy(filelist)
+    # read the inputs in place, s3 and http files with range reads
+    filelist_tmp, copies = GDALPaths(filelist)
 
     kwargs = {
         # "format": "GTiff",
@@ -98,7 +180,9 @@ def gdalwarp(filelist,
     }
 
     if dstNodata is not None:
+        # the cells not covered by any input are initialized to nodata by the warp
         kwargs["dstNodata"] = dstNodata
+        kwargs["warpOptions"] = ["INIT_DEST=NO_DATA"]
 
     # outputType = [-ot {Byte/Int16/UInt16/UInt32/Int32/Float32/Float64/CInt16/CInt32/CFloat32/CFloat64}]
     if ot and ot in dtypeOf:
@@ -114,7 +198,7 @@ def gdalwarp(filelist,
         kwargs["xRes"] = abs(pixelsize[0])
         kwargs["yRes"] = abs(pixelsize[1])
 
-    if len(filelist) == 1 and SameSpatialRef(filelist_tmp[0], dstSRS):
+    if len(filelist) == 1 and SameSpatialRef(filelist[0], dstSRS):
         Logger.debug(f"Avoid reprojecting {filelist[0]}")
     elif dstSRS:
         kwargs["dstSRS"] = GetSpatialRef(dstSRS)
@@ -133,26 +217,110 @@ def gdalwarp(filelist,
     try:
         gdal.UseExceptions()
         gdal.PushErrorHandler('CPLQuietErrorHandler')
-        gdal.Warp(filetmp, filelist_tmp, **kwargs)
+        with VSICache(vsi_cache):
+            if workers and workers > 1:
+                WarpTiles(filelist_tmp, filetmp, kwargs, format=format, tilesize=tilesize or 4096,
+                          workers=workers, cachemax=cachemax)
+            else:
+                gdal.Warp(filetmp, filelist_tmp, **kwargs)
     except Exception as ex:
         Logger.error(ex)
     finally:
         gdal.PopErrorHandler()
 
-    # patch notdata value
-    if dstNodata is not None and GetNoData(filetmp) != dstNodata:
+    # patch notdata value, in place block by block
+    if dstNodata is not None and format != "vrt" and GetNoData(filetmp) != dstNodata:
         Logger.debug(f"gdalwarp: fixing nodata value to {dstNodata}")
-        GDALFixNoData(filetmp, format=format, nodata = dstNodata)
+        GDALFixNoData(filetmp, format=format, nodata=dstNodata)
 
     # moving the filetmp to fileout
-    move(filetmp, fileout)
+    if filetmp != fileout:
+        move(filetmp, fileout)
 
     Logger.debug(
         f"gdalwarp: converted to {filetmp} in {total_seconds_from(t0)} s.")
 
-    # clean the cutline file
+    # clean the cutline file and the inputs copied
     remove(cutline_tmp)
+    remove(copies)
 
     Logger.debug(f"gdalwarp: completed in {total_seconds_from(t0)} s.")
     # ----------------------------------------------------------------------
     return fileout
+
+
+def WarpToArray(filelist,
+                dstSRS="",
+                cutline="",
+                cropToCutline=False,
+                pixelsize=(0, 0),
+                resampleAlg="near",
+                ot=None,
+                dstNodata=None,
+                vsi_cache=None,
+                dtype=np.float32,
+                load_nodata_as=np.nan):
+    """
+    WarpToArray - warp filelist into a MEM dataset and return its pixels,
+    nothing is written on disk and the dataset is freed right away
+    :return: data, gt, prj, data is (bands, rows, cols) for multi-band inputs
+    """
+    filelist = listify(filelist)
+    if len(filelist) == 0:
+        Logger.warning("WarpToArray: filelist is empty")
+        return None, None, None
+
+    filelist_tmp, copies = GDALPaths(filelist)
+
+    kwargs = {
+        "format": "MEM",
+        "resampleAlg": resampling_method(resampleAlg),
+        "multithread": True,
+    }
+    if dstNodata is not None:
+        kwargs["dstNodata"] = dstNodata
+        kwargs["warpOptions"] = ["INIT_DEST=NO_DATA"]
+    if ot and ot in dtypeOf:
+        ot = ot.lower() if isinstance(ot, str) else ot
+        kwargs["outputType"] = dtypeOf[ot]
+
+    pixelsize = listify(pixelsize)
+    if len(pixelsize) == 1 and pixelsize[0] != 0:
+        kwargs["xRes"] = abs(pixelsize[0])
+        kwargs["yRes"] = abs(pixelsize[0])
+    elif len(pixelsize) == 2 and pixelsize[0] != 0 and pixelsize[1] != 0:
+        kwargs["xRes"] = abs(pixelsize[0])
+        kwargs["yRes"] = abs(pixelsize[1])
+
+    if dstSRS and not (len(filelist) == 1 and SameSpatialRef(filelist[0], dstSRS)):
+        kwargs["dstSRS"] = GetSpatialRef(dstSRS)
+
+    cutline_tmp = None
+    if isfile(cutline):
+        cutline_tmp = copy(cutline)
+        kwargs["cropToCutline"] = cropToCutline
+        kwargs["cutlineDSName"] = cutline_tmp
+        kwargs["cutlineLayer"] = juststem(cutline_tmp)
+    elif isinstance(cutline, (tuple, list)) and len(cutline) == 4:
+        kwargs["outputBounds"] = listify(cutline)
+
+    data, gt, prj = None, None, None
+    try:
+        gdal.UseExceptions()
+        gdal.PushErrorHandler('CPLQuietErrorHandler')
+        with VSICache(vsi_cache):
+            ds = gdal.Warp("", filelist_tmp, **kwargs)
+        if ds:
+            nodata = [ds.GetRasterBand(b).GetNoDataValue() for b in range(1, ds.RasterCount + 1)]
+            data = ds.ReadAsArray()
+            gt, prj = ds.GetGeoTransform(), ds.GetProjection()
+            ds = None
+            data = translate_nodata(data, nodata if len(nodata) > 1 else nodata[0], dtype, load_nodata_as)
+    except Exception as ex:
+        Logger.error(ex)
+    finally:
+        gdal.PopErrorHandler()
+
+    remove(cutline_tmp)
+    remove(copies)
+    return data, gt, prj
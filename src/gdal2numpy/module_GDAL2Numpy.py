@@ -22,10 +22,12 @@
 #
 # Created:
 # -------------------------------------------------------------------------------
+import os
 import math
 import numpy as np
-from osgeo import gdal
-from .filesystem import now, total_seconds_from, justfname
+from concurrent.futures import ThreadPoolExecutor
+from osgeo import gdal, gdalconst
+from .filesystem import now, total_seconds_from, justfname, listify
 from .module_ogr import TransformBBOX
 from .module_s3 import *
 from .module_open import OpenRaster
@@ -33,96 +35,358 @@ from .module_log import Logger
 from .module_memory import mem_usage
 
 
-def GDAL2Numpy(filename, band=1, dtype=np.float32, load_nodata_as=np.nan, bbox=[], bbox_srs=None, verbose=False):
+data_type_of = {
+    'Float32': np.float32,
+    'Float64': np.float64,
+    'Byte': np.uint8,
+    'Int16': np.int16,
+    'Int32': np.int32,
+    'UInt16': np.uint16,
+    'UInt32': np.uint32,
+}
+
+
+def resampling_method(method):
+    """
+    reasampling_method translation form text to gdalconst
+    """
+    algorithms = {
+        "near": gdalconst.GRIORA_NearestNeighbour,
+        "bilinear": gdalconst.GRIORA_Bilinear,
+        "cubic": gdalconst.GRIORA_Cubic,
+        "cubicspline": gdalconst.GRIORA_CubicSpline,
+        "lanczos": gdalconst.GRIORA_Lanczos,
+        "average": gdalconst.GRIORA_Average,
+        "rms": gdalconst.GRIORA_RMS,
+        "mode": gdalconst.GRIORA_Mode,
+        "gauss": gdalconst.GRIORA_Gauss,
+    }
+    method = method.lower() if isinstance(method, str) else None
+    return algorithms.get(method, gdalconst.GRIORA_NearestNeighbour)
+
+
+def nodata_mask(data, no_data, load_nodata_as=np.nan):
+    """
+    nodata_mask - the mask of the cells of data to be loaded as load_nodata_as
+    built directly on the native buffer, None if there is nothing to translate
+    """
+    mask = None
+    if data.dtype.kind == "f":
+        if no_data is not None and np.isinf(no_data):
+            mask = np.isinf(data)
+        elif no_data is not None and not np.isnan(no_data):
+            mask = data == data.dtype.type(no_data)
+        if not np.isnan(load_nodata_as):
+            mask = np.isnan(data) if mask is None else np.logical_or(mask, np.isnan(data), out=mask)
+    elif no_data is not None and no_data != load_nodata_as:
+        info = np.iinfo(data.dtype)
+        mask = data == no_data if info.min <= no_data <= info.max else None
+    return mask
+
+
+def fill_nodata(data, out, no_data, load_nodata_as=np.nan, chunksize=2**20):
+    """
+    fill_nodata - copy data into out (if they differ) filling the nodata cells
+    with load_nodata_as, chunk by chunk
+    """
+    # NaN can not be stored in integer types
+    fill = out.dtype.kind == "f" or not np.isnan(load_nodata_as)
+    rows = max(1, chunksize // max(1, int(np.prod(data.shape[1:]))))
+    for i in range(0, data.shape[0], rows):
+        src, dst = data[i:i + rows], out[i:i + rows]
+        mask = nodata_mask(src, no_data, load_nodata_as) if fill else None
+        if out is not data:
+            np.copyto(dst, src, casting="unsafe")
+        if mask is not None:
+            np.copyto(dst, load_nodata_as, casting="unsafe", where=mask)
+
+
+def translate_nodata(data, no_data, dtype=np.float32, load_nodata_as=np.nan, chunksize=2**20):
+    """
+    translate_nodata - translate the no_data values of data as load_nodata_as
+    and convert data to dtype in a single pass, chunk by chunk. The only full
+    size allocation is the output array when dtype differs from the native one.
+    In case of a (bands, rows, cols) array no_data can be a list, one per band.
+    """
+    if data is None:
+        return data
+
+    native = data.dtype
+    dtype = np.dtype(dtype) if dtype else native
+    if dtype != native:
+        Logger.debug("Converting data type from %s to %s" % (native, dtype))
+        out = np.empty(data.shape, dtype=dtype)
+    else:
+        out = data
+
+    if data.ndim == 3 and isinstance(no_data, (list, tuple)):
+        for k in range(data.shape[0]):
+            fill_nodata(data[k], out[k], no_data[k], load_nodata_as, chunksize)
+    else:
+        fill_nodata(data, out, no_data, load_nodata_as, chunksize)
+
+    return out
+
+
+def check_buffer(out, shape):
+    """
+    check_buffer - check that out can receive a window of the given shape
+    """
+    if not isinstance(out, np.ndarray):
+        Logger.error(f"out must be a numpy array, not {type(out)}")
+        return False
+    if out.shape != tuple(shape):
+        Logger.error(f"out has shape {out.shape} but the window is {tuple(shape)}")
+        return False
+    if out.dtype.type not in data_type_of.values():
+        Logger.error(f"out has an unsupported dtype {out.dtype}")
+        return False
+    if not out.flags.writeable:
+        Logger.error("out is read-only")
+        return False
+    return True
+
+
+def BestOverview(band, factor):
+    """
+    BestOverview - the coarsest overview of band (or the band itself) whose
+    decimation factor does not exceed factor
+    """
+    best, best_factor = band, 1.0
+    for k in range(band.GetOverviewCount()):
+        ov = band.GetOverview(k)
+        if ov:
+            ov_factor = min(band.XSize / ov.XSize, band.YSize / ov.YSize)
+            if best_factor < ov_factor <= factor:
+                best, best_factor = ov, ov_factor
+    return best
+
+
+def MemmapLayout(filename, ds, band=1):
+    """
+    MemmapLayout - the (offset, dtype) of the pixels of band when they are
+    stored uncompressed and untiled in one contiguous run of strips of a
+    local GTiff, None otherwise
+    """
+    if not isinstance(filename, str) or not os.path.isfile(filename):
+        return None
+    if ds.GetDriver().ShortName != "GTiff":
+        return None
+    structure = ds.GetMetadata("IMAGE_STRUCTURE") or {}
+    if structure.get("COMPRESSION", "NONE").upper() != "NONE":
+        return None
+    if ds.RasterCount > 1 and structure.get("INTERLEAVE", "BAND").upper() != "BAND":
+        return None
+
+    bandx = ds.GetRasterBand(band)
+    m, n = ds.RasterYSize, ds.RasterXSize
+    bx, by = bandx.GetBlockSize()
+    if bx != n:
+        return None
+    offset = bandx.GetMetadataItem("BLOCK_OFFSET_0_0", "TIFF")
+    if not offset:
+        return None
+    offset = int(offset)
+
+    with open(filename, "rb") as stream:
+        byteorder = "<" if stream.read(2) == b"II" else ">"
+    dtype = np.dtype(data_type_of[gdal.GetDataTypeName(bandx.DataType)]).newbyteorder(byteorder)
+
+    # the strips must follow each other
+    stripsize = by * n * dtype.itemsize
+    for i in range(1, math.ceil(m / by)):
+        if int(bandx.GetMetadataItem(f"BLOCK_OFFSET_0_{i}", "TIFF") or -1) != offset + i * stripsize:
+            return None
+    return offset, dtype
+
+
+def BBoxWindow(bbox, gt, m, n, bbox_srs=None, prj=None):
+    """
+    BBoxWindow - the index-safe pixel window (j0, i0, cols, rows) of a m x n raster
+    covering the bbox and its geotransform
+    """
+    x0, px, r0, y0, r1, py = gt
+    if bbox_srs:
+        X0, Y0, X1, Y1 = TransformBBOX(bbox, bbox_srs, prj)
+    else:
+        X0, Y0, X1, Y1 = bbox
+
+    # calcutate starting indices
+    j0, i0 = int((X0 - x0) / px), int((Y1 - y0) / py)
+    cols, rows = math.ceil((X1 - X0) / px), math.ceil(abs(Y1 - Y0) / abs(py))
+    # assert cols > 0 and rows > 0,
+    cols = max(1, cols)
+    rows = max(1, rows)
+
+    # index-safe
+    j0, i0 = min(max(j0, 0), n - 1), min(max(i0, 0), m - 1)
+
+    # index-safe
+    j1, i1 = min(j0 + cols, n), min(i0 + rows, m)
+    # Re-calculate cols and rows
+    cols, rows = j1 - j0, i1 - i0
+
+    # re-arrange gt
+    k = math.floor((X0 - x0) / px)
+    h = math.floor((Y1 - y0) / py)
+    gt = x0 + k * px, px, r0, y0 + h * py, r1, py
+
+    return (j0, i0, cols, rows), gt
+
+
+def ReadStripe(filename, band_list, window, out, no_data, load_nodata_as=np.nan):
+    """
+    ReadStripe - read a window of filename into out with its own dataset handle
+    and translate its nodata in place
+    """
+    j0, i0, cols, rows = window
+    ds = OpenRaster(filename)
+    if ds:
+        if out.ndim == 3 and len(band_list) > 1:
+            ds.ReadAsArray(j0, i0, cols, rows, band_list=band_list, buf_obj=out)
+        elif out.ndim == 3:
+            ds.GetRasterBand(band_list[0]).ReadAsArray(j0, i0, cols, rows, buf_obj=out[0])
+        else:
+            ds.GetRasterBand(band_list[0]).ReadAsArray(j0, i0, cols, rows, buf_obj=out)
+        translate_nodata(out, no_data, out.dtype, load_nodata_as)
+        ds = None
+    return out
+
+
+def ReadParallel(filename, band_list, window, out, no_data, load_nodata_as=np.nan, num_threads=4, blocksize=256):
+    """
+    ReadParallel - read a window of filename into out splitting it in
+    block-aligned stripes read concurrently, each one by its own handle
+    """
+    j0, i0, cols, rows = window
+    # block-aligned stripes, twice the threads to balance the load
+    step = blocksize * max(1, math.ceil(rows / (2 * num_threads * blocksize)))
+    edges = [i0] + [i for i in range(math.ceil(i0 / blocksize) * blocksize, i0 + rows, step) if i > i0] + [i0 + rows]
+    Logger.debug(f"Reading {len(edges) - 1} stripes with {num_threads} threads")
+    with ThreadPoolExecutor(max_workers=num_threads) as executor:
+        futures = []
+        for a, b in zip(edges[:-1], edges[1:]):
+            stripe = out[..., a - i0:b - i0, :]
+            futures.append(executor.submit(ReadStripe, filename, band_list, (j0, a, cols, b - a), stripe,
+                                           no_data, load_nodata_as))
+        for future in futures:
+            future.result()
+    return out
+
+
+def GDAL2Numpy(filename, band=1, dtype=np.float32, load_nodata_as=np.nan, bbox=[], bbox_srs=None, out=None,
+               out_shape=None, pixelsize=None, resampleAlg="near", num_threads=1, mmap=False,
+               verbose=False):
     """
     GDAL2Numpy
+    :param band: the band number, a list of bands or "all" to read a (bands, rows, cols) stack
+    :param out: optional preallocated array (a view or a memmap) of the shape
+                of the window to read into, its dtype overrides dtype
+    :param out_shape: optional (rows, cols) of the decimated output
+    :param pixelsize: optional output pixel size px or (px, py), ignored if out_shape is given
+    :param resampleAlg: the resampling method of decimated reads
+    :param num_threads: read full resolution windows in parallel stripes with num_threads threads
+    :param mmap: return a copy-on-write numpy.memmap of uncompressed, untiled GTiffs
+                 (see Numpy2GTiff(..., layout="mmap")) instead of reading them
     """
     t0 = now()
-    data_type_of = {
-        'Float32': np.float32,
-        'Float64': np.float64,
-        'Byte': np.uint8,
-        'Int16': np.int16,
-        'Int32': np.int32,
-        'UInt16': np.uint16,
-        'UInt32': np.uint32,
-    }
 
     ds = OpenRaster(filename)
     if ds:
-        band = ds.GetRasterBand(band)
+        band_list = list(range(1, ds.RasterCount + 1)) if f"{band}".lower() == "all" else band
+        multiband = isinstance(band_list, (list, tuple))
+        band_list = list(band_list) if multiband else [band_list]
+        band = ds.GetRasterBand(band_list[0])
         m, n = ds.RasterYSize, ds.RasterXSize
         gt, prj = ds.GetGeoTransform(), ds.GetProjection()
-        no_data = band.GetNoDataValue()
+        no_data = [ds.GetRasterBand(b).GetNoDataValue() for b in band_list]
+        no_data = no_data if multiband else no_data[0]
         band_type = data_type_of[gdal.GetDataTypeName(band.DataType)]
         Logger.debug("Data type: %s" % band_type)
 
-        if not bbox:
-            data = band.ReadAsArray(0, 0, n, m)
-        else:
-            x0, px, r0, y0, r1, py = gt
-            if bbox_srs:
-                X0, Y0, X1, Y1 = TransformBBOX(bbox, bbox_srs, prj)
-            else:
-                X0, Y0, X1, Y1 = bbox
+        if mmap and not (bbox or multiband or out_shape or pixelsize or out is not None):
+            layout = MemmapLayout(filename, ds, band_list[0])
+            if layout and (not dtype or np.dtype(dtype) == layout[1]):
+                # zero-copy: nodata cells are translated in copy-on-write pages
+                offset, native = layout
+                data = np.memmap(filename, dtype=native, mode="c", offset=offset, shape=(m, n))
+                data = translate_nodata(data, no_data, None, load_nodata_as)
+                band, ds = None, None
+                Logger.debug(f"Mapping {justfname(filename)} in {total_seconds_from(t0)}s.")
+                return data, gt, prj
+            Logger.debug(f"{justfname(filename)} can not be memory mapped, reading it")
 
-            # calcutate starting indices
-            j0, i0 = int((X0 - x0) / px), int((Y1 - y0) / py)
-            cols, rows = math.ceil((X1 - X0) / px), math.ceil(abs(Y1 - Y0) / abs(py))
-            # assert cols > 0 and rows > 0,
-            cols = max(1, cols)
-            rows = max(1, rows)
+        j0, i0, cols, rows = 0, 0, n, m
+        if bbox:
+            (j0, i0, cols, rows), gt = BBoxWindow(bbox, gt, m, n, bbox_srs, prj)
 
+        # decimated output size
+        bcols, brows = cols, rows
+        if out_shape:
+            brows, bcols = out_shape
+        elif pixelsize:
+            pixelsize = listify(pixelsize)
+            psx, psy = (pixelsize[0], pixelsize[0]) if len(pixelsize) == 1 else pixelsize[:2]
+            x0, px, r0, y0, r1, py = gt
+            bcols = max(1, round(cols * abs(px) / abs(psx)))
+            brows = max(1, round(rows * abs(py) / abs(psy)))
 
-            # print("mxn", m,"x", n)
-            # print("cols, rows", cols, "x", rows)   
-            # print("j0, i0", j0, i0) 
+        kwargs = {}
+        if (bcols, brows) != (cols, rows):
+            # re-arrange gt to the decimated pixel size
+            x0, px, r0, y0, r1, py = gt
+            cx, cy = cols / bcols, rows / brows
+            gt = x0, px * cx, r0 * cy, y0, r1 * cx, py * cy
 
-            # index-safe
-            j0, i0 = min(max(j0, 0), n - 1), min(max(i0, 0), m - 1)
-            
-            # index-safe
-            j1, i1 = min(j0 + cols, n), min(i0 + rows, m)
-            # Re-calculate cols and rows
-            cols, rows = j1 - j0, i1 - i0
+            # read from the best overview straight into a buffer of bcols x brows
+            # (a band stack is decimated by the dataset RasterIO that uses overviews as well)
+            ov = BestOverview(band, min(cx, cy)) if not multiband else band
+            if ov is not band:
+                Logger.debug(f"Reading from the overview {ov.XSize}x{ov.YSize}")
+                dx, dy = n / ov.XSize, m / ov.YSize
+                j0, i0 = int(j0 / dx), int(i0 / dy)
+                cols = max(1, min(round(cols / dx), ov.XSize - j0))
+                rows = max(1, min(round(rows / dy), ov.YSize - i0))
+                band = ov
+            kwargs = {
+                "buf_xsize": bcols,
+                "buf_ysize": brows,
+                "resample_alg": resampling_method(resampleAlg)
+            }
 
-            # re-arrange gt
-            k = math.floor((X0 - x0) / px)
-            h = math.floor((Y1 - y0) / py)
-            gt = x0 + k * px, px, r0, y0 + h * py, r1, py
+        shape = (len(band_list), brows, bcols) if multiband else (brows, bcols)
+        if out is not None:
+            if not check_buffer(out, shape):
+                band, ds = None, None
+                return None, None, None
+            dtype = out.dtype
 
-            #print("ReadAsArray(%d,%d,%d,%d)" % (j0, i0, cols, rows))
+        if num_threads and num_threads > 1 and not kwargs and isinstance(filename, str):
+            # every stripe is read and translated by its own thread into one shared array
+            dtype = np.dtype(dtype) if dtype else np.dtype(band_type)
+            out = out if out is not None else np.empty(shape, dtype=dtype)
+            data = ReadParallel(filename, band_list, (j0, i0, cols, rows), out, no_data, load_nodata_as,
+                                num_threads=num_threads, blocksize=band.GetBlockSize()[1])
+            band, ds = None, None
+            mem_usage()
+            Logger.debug(f"Reading {justfname(filename)} in {total_seconds_from(t0)}s.")
+            return data, gt, prj
 
-            data = band.ReadAsArray(j0, i0, cols, rows)
+        if out is not None:
+            # GDAL reads and converts straight into the caller buffer
+            kwargs["buf_obj"] = out
+
+        if multiband:
+            # one RasterIO for all the bands, band interleaved
+            if out is not None and len(band_list) == 1:
+                kwargs["buf_obj"] = out[0]
+            data = ds.ReadAsArray(j0, i0, cols, rows, band_list=band_list, **kwargs)
+            data = data[np.newaxis] if data is not None and data.ndim == 2 else data
+        else:
+            data = band.ReadAsArray(j0, i0, cols, rows, **kwargs)
 
         # translate no-data as Nan
-        if data is not None:
-
-            if not np.isnan(load_nodata_as):
-                data[np.isnan(data)] = load_nodata_as
-
-            # Output datatype
-            if dtype and dtype != band_type:
-                Logger.debug("Converting data type from %s to %s" % (band_type, dtype))
-                data = data.astype(dtype, copy=False)
-
-            if band_type == np.float32:
-                no_data = np.float32(no_data)
-                if no_data is not None and np.isinf(no_data):
-                    data[np.isinf(data)] = load_nodata_as
-                elif no_data is not None:
-                    data[data == no_data] = load_nodata_as
-
-            elif band_type == np.float64:
-                no_data = np.float64(no_data)
-                if no_data is not None and np.isinf(no_data):
-                    data[np.isinf(data)] = load_nodata_as
-                elif no_data is not None:
-                    data[data == no_data] = load_nodata_as
-
-            elif band_type in (np.uint8, np.int16, np.uint16, np.int32, np.uint32):
-                if no_data != load_nodata_as:
-                    data[data == no_data] = load_nodata_as
+        data = translate_nodata(data, no_data, dtype, load_nodata_as)
 
         band = None
         ds = None
@@ -131,3 +395,48 @@ def GDAL2Numpy(filename, band=1, dtype=np.float32, load_nodata_as=np.nan, bbox=[
         return data, gt, prj
     Logger.error(f"file <{filename}> not exists!")
     return None, None, None
+
+
+def GDAL2NumpyTiles(filename, band=1, dtype=np.float32, load_nodata_as=np.nan, tilesize=None, halo=0, verbose=False):
+    """
+    GDAL2NumpyTiles - read the raster tile by tile in bounded memory
+    :param tilesize: the tile size (cols, rows) or a single int, default is the native block size
+    :param halo: the number of overlapping pixels around each tile
+    :return: yields (data, window, gt) where window is (j0, i0, cols, rows)
+    """
+    t0 = now()
+    ds = OpenRaster(filename)
+    if ds:
+        band = ds.GetRasterBand(band)
+        m, n = ds.RasterYSize, ds.RasterXSize
+        x0, px, r0, y0, r1, py = ds.GetGeoTransform()
+        no_data = band.GetNoDataValue()
+
+        if not tilesize:
+            tw, th = band.GetBlockSize()
+        elif isinstance(tilesize, (tuple, list)):
+            tw, th = tilesize
+        else:
+            tw, th = tilesize, tilesize
+        tw, th = max(1, min(tw, n)), max(1, min(th, m))
+        halo = max(0, int(halo))
+        Logger.debug(f"Reading {justfname(filename)} in tiles of {tw}x{th} (halo={halo})")
+
+        for i in range(0, m, th):
+            for j in range(0, n, tw):
+                # index-safe window with halo
+                i0, j0 = max(i - halo, 0), max(j - halo, 0)
+                i1, j1 = min(i + th + halo, m), min(j + tw + halo, n)
+                cols, rows = j1 - j0, i1 - i0
+
+                data = band.ReadAsArray(j0, i0, cols, rows)
+                data = translate_nodata(data, no_data, dtype, load_nodata_as)
+
+                gt = x0 + j0 * px + i0 * r0, px, r0, y0 + j0 * r1 + i0 * py, r1, py
+                yield data, (j0, i0, cols, rows), gt
+
+        band = None
+        ds = None
+        Logger.debug(f"Reading {justfname(filename)} in {total_seconds_from(t0)}s.")
+    else:
+        Logger.error(f"file <{filename}> not exists!")
@@ -125,7 +125,7 @@ def GTiff2Cog(filetif, fileout=None, algo="NEAREST"):
     return fileout if os.path.isfile(fileout) else None
 
 
-def Numpy2GTiff(arr, gt, prj, fileout, format="GTiff", save_nodata_as=-9999, metadata=None, verbose=False):
+def Numpy2GTiff(arr, gt, prj, fileout, format="GTiff", save_nodata_as=-9999, metadata=None, layout=None, verbose=False):
     """
     Numpy2GTiff - Write a numpy array in  a GTiff file
     :param arr: the numpy array
@@ -135,6 +135,7 @@ def Numpy2GTiff(arr, gt, prj, fileout, format="GTiff", save_nodata_as=-9999, met
     :param format: the format GTiff/COG/etc...
     :param save_nodata_as: the nodata
     :param metadata:
+    :param layout: "mmap" writes an uncompressed, untiled GTiff that GDAL2Numpy(..., mmap=True) maps without copies
     :return: returns the pathname
     """
     GDT = {
@@ -148,7 +149,16 @@ def Numpy2GTiff(arr, gt, prj, fileout, format="GTiff", save_nodata_as=-9999, met
         'float64': gdal.GDT_Float64
     }
 
-    if format.upper() == "GTIFF":
+    if isinstance(arr, np.ndarray) and arr.ndim != 2:
+        Logger.error(f"Numpy2GTiff: expected a (rows, cols) array, got shape {arr.shape}")
+        return None
+
+    if format.upper() == "GTIFF" and layout == "mmap" and isinstance(arr, np.ndarray):
+        # a single strip when it fits, so the pixels are one contiguous run
+        rows, cols = arr.shape
+        strip = rows if rows * cols * arr.dtype.itemsize < 2**31 else max(1, 2**31 // (cols * arr.dtype.itemsize))
+        CO = ["BIGTIFF=YES", "TILED=NO", "COMPRESS=NONE", "INTERLEAVE=BAND", f"BLOCKYSIZE={strip}"]
+    elif format.upper() == "GTIFF":
         CO = ["BIGTIFF=YES", "TILED=YES", "BLOCKXSIZE=512", "BLOCKYSIZE=512", "COMPRESS=LZW"]
     elif format.upper() == "COG":
         CO = ["BIGTIFF=YES", "COMPRESS=LZW", "NUM_THREADS=ALL_CPUS"]
@@ -29,7 +29,7 @@ import numpy as np
 import tempfile
 from osgeo import ogr, osr
 from .filesystem import listify, md5sum, md5text, juststem
-from .module_ogr import SameSpatialRef, GetSpatialRef
+from .module_ogr import SameSpatialRef, GetSpatialRef, GetTransformation
 from .module_log import Logger
 from .module_open import OpenShape
 
@@ -255,12 +255,7 @@ def Transform(fileshp, t_srs, fileout=None):
 
         # set spatial reference and transformation
         defn = layer.GetLayerDefn()
-        s_srs = layer.GetSpatialRef()
-        if s_srs and s_srs.IsGeographic():
-            s_srs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
-        if t_srs and t_srs.IsGeographic():
-            t_srs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
-        transform = osr.CoordinateTransformation(s_srs, t_srs)
+        transform = GetTransformation(layer.GetSpatialRef(), t_srs)
 
         driver = ogr.GetDriverByName("Esri Shapefile")
         dw = driver.CreateDataSource(fileout)
@@ -307,14 +302,9 @@ def QueryByPoint(file_shp, point):
         layer = ds.GetLayer(0)
         t_srs = layer.GetSpatialRef()
 
-        s_srs = osr.SpatialReference()
-        s_srs.ImportFromEPSG(4326)
-        s_srs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
-
         # Transform the point into the same projection system as the layer
-        if not SameSpatialRef(t_srs, s_srs):
-            transform = osr.CoordinateTransformation(s_srs, t_srs)
-            point.Transform(transform)
+        if not SameSpatialRef(t_srs, 4326):
+            point.Transform(GetTransformation(4326, t_srs))
 
         closest_distance = float('inf')
 
@@ -25,23 +25,23 @@
 import os
 import numpy as np
 from osgeo import gdal, gdalconst
-from .filesystem import forceext, filetojson, remove
-from .module_s3 import isfile, israster, isshape
-from .module_GDAL2Numpy import GDAL2Numpy
+from .filesystem import forceext, filetojson, remove, tempfilename, justpath
+from .module_s3 import isfile, israster, isshape, move
+from .module_GDAL2Numpy import GDAL2Numpy, data_type_of
 from .module_Numpy2GTiff import Numpy2GTiff
 from .module_features import GetRange
-from .module_ogr import GetExtent
+from .module_ogr import GetExtent, DescribeRaster
 from .module_open import OpenRaster
 from .module_xml import parseQMD, writeQMD
+from .module_log import Logger
 
 def GetRasterShape(filename):
     """
     GetRasterShape
     """
-    ds = OpenRaster(filename)
-    if ds:
-        m, n = ds.RasterYSize, ds.RasterXSize
-        return m, n
+    info = DescribeRaster(filename)
+    if info:
+        return info.shape
     return 0, 0
 
 
@@ -49,10 +49,9 @@ def GetTransform(filename):
     """
     GetTransform
     """
-    ds = OpenRaster(filename)
-    if ds:
-        gt = ds.GetGeoTransform()
-        return gt
+    info = DescribeRaster(filename)
+    if info:
+        return info.gt
     return None
 
 
@@ -60,12 +59,11 @@ def GetNoData(filename, band=1):
     """
     GetNoData
     """
-    ds = OpenRaster(filename)
-    if ds:
+    info = DescribeRaster(filename)
+    if info:
         # check if band exists
-        if band > 0 and band <= ds.RasterCount:
-            bandx = ds.GetRasterBand(band)
-            return bandx.GetNoDataValue()
+        if band > 0 and band <= info.count:
+            return info.nodata[band - 1]
     return None
 
 
@@ -81,17 +79,98 @@ def SetNoData(filename, nodata):
     return None
 
 
+def compute_statistics(band):
+    """
+    compute_statistics - compute and save the statistics of band, a band
+    with no valid pixels is left without statistics
+    """
+    try:
+        return band.ComputeStatistics(False)
+    except RuntimeError as ex:
+        Logger.debug(f"compute_statistics: {ex}")
+    return None
+
+
 def GDALFixNoData(filename, format="GTiff", nodata=-9999):
     """
-    GDALFixNoData
+    GDALFixNoData - set the nodata value of the bands and write it over the
+    old nodata, the NaN and the abs(value) >= 1e10 cells, block by block.
+    An uncompressed local GTiff is updated in place, a compressed one is
+    copied because the rewritten blocks would be appended and the file would
+    grow at every call, a remote one (s3, http) because it can not be opened
+    in update mode. The statistics are computed on the same pass.
     """
-    if isfile(filename):
+    if not isfile(filename):
+        return False
+    if format and format.lower() != "gtiff":
         data, gt, prj = GDAL2Numpy(filename, load_nodata_as=nodata)
         data[abs(data) >= 1e10] = nodata
         Numpy2GTiff(data, gt, prj, filename,
                     format=format, save_nodata_as=nodata)
         return filename
-    return False
+
+    ds = OpenRaster(filename)
+    if not ds:
+        return False
+    dtype = np.dtype(data_type_of.get(gdal.GetDataTypeName(ds.GetRasterBand(1).DataType), np.float64))
+    if np.issubdtype(dtype, np.integer) and \
+            not (float(nodata).is_integer() and np.iinfo(dtype).min <= nodata <= np.iinfo(dtype).max):
+        Logger.error(f"GDALFixNoData: nodata {nodata} does not fit the {dtype} bands of {filename}")
+        return False
+
+    compression = (ds.GetMetadata("IMAGE_STRUCTURE") or {}).get("COMPRESSION")
+    copying = compression or not os.path.isfile(filename)
+    if copying:
+        filetmp = tempfilename(prefix="fixnodata/tmp_", suffix=".tif")
+        os.makedirs(justpath(filetmp), exist_ok=True)
+        options = ["BIGTIFF=YES", "TILED=YES", "BLOCKXSIZE=512", "BLOCKYSIZE=512"]
+        options += [f"COMPRESS={compression}"] if compression else []
+        out = gdal.GetDriverByName("GTiff").Create(filetmp, ds.RasterXSize, ds.RasterYSize, ds.RasterCount,
+                                                   ds.GetRasterBand(1).DataType, options)
+        out.SetGeoTransform(ds.GetGeoTransform())
+        out.SetProjection(ds.GetProjection())
+        out.SetMetadata(ds.GetMetadata())
+    else:
+        ds = None
+        ds = out = OpenRaster(filename, gdalconst.GA_Update)
+        if not ds:
+            return False
+
+    for b in range(1, ds.RasterCount + 1):
+        band, outband = ds.GetRasterBand(b), out.GetRasterBand(b)
+        old_nodata = band.GetNoDataValue()
+        bx, by = band.GetBlockSize()
+        count, total, total2 = 0, 0.0, 0.0
+        minv, maxv = np.inf, -np.inf
+        for i0 in range(0, ds.RasterYSize, by):
+            for j0 in range(0, ds.RasterXSize, bx):
+                cols, rows = min(bx, ds.RasterXSize - j0), min(by, ds.RasterYSize - i0)
+                data = band.ReadAsArray(j0, i0, cols, rows)
+                mask = abs(data) >= 1e10
+                if np.issubdtype(data.dtype, np.floating):
+                    mask |= np.isnan(data)
+                if old_nodata is not None:
+                    mask |= data == old_nodata
+                # in place just the blocks with something to fix are rewritten
+                changed = np.any(mask) and np.any(data[mask] != nodata)
+                if changed:
+                    data[mask] = nodata
+                if changed or out is not ds:
+                    outband.WriteArray(data, j0, i0)
+                valid = data[~(mask | (data == nodata))].astype(np.float64)
+                if valid.size:
+                    count += valid.size
+                    total += valid.sum()
+                    total2 += np.square(valid).sum()
+                    minv, maxv = min(minv, valid.min()), max(maxv, valid.max())
+        outband.SetNoDataValue(nodata)
+        if count:
+            mean = total / count
+            outband.SetStatistics(float(minv), float(maxv), mean, float(np.sqrt(max(total2 / count - mean * mean, 0))))
+    band, outband, ds, out = None, None, None, None
+    if copying:
+        move(filetmp, filename)
+    return filename
 
 
 def IsEmpty(filename, nodata=-9999):
@@ -164,28 +243,19 @@ def GetMetaData(filename):
     :return: returns a dictionary with metadata
     """
     if israster(filename):
-        ds = OpenRaster(filename)
-        if ds:
-            m, n = ds.RasterYSize, ds.RasterXSize
-            band = ds.GetRasterBand(1)
-            gt = ds.GetGeoTransform()
-            wkt = ds.GetProjection()
-            meta = ds.GetMetadata()
-            nodata = band.GetNoDataValue()
-            minx, px, _, maxy, _, py = gt
-            maxx = minx + n * px
-            miny = maxy + m * py
-            miny, maxy = min(miny, maxy), max(miny, maxy)
-            ds = None
+        info = DescribeRaster(filename)
+        if info:
+            m, n = info.shape
+            _, px, _, _, _, py = info.gt
             return {
                 "m": m,
                 "n": n,
                 "px": px,
                 "py": py,
-                "wkt": wkt,
-                "nodata": nodata,
-                "extent": [minx, miny, maxx, maxy],
-                "metadata": meta
+                "wkt": info.wkt,
+                "nodata": info.nodata[0] if info.count else None,
+                "extent": list(info.extent),
+                "metadata": dict(info.metadata)
             }
     elif isshape(filename):
         return read_metadata(filename)
@@ -23,6 +23,7 @@
 # Created:     16/06/2021
 # -------------------------------------------------------------------------------
 import glob
+import gzip
 import math
 import os
 import re
@@ -30,6 +31,9 @@ import json
 import pkgutil
 import shutil
 import site
+import threading
+import numpy as np
+from collections import OrderedDict
 from osgeo import gdal
 from osgeo import osr, ogr
 from pyproj import CRS
@@ -39,6 +43,7 @@ from .module_open import OpenRaster, get
 from .module_open import OpenShape
 from .module_s3 import isfile, isshape, israster
 from .module_log import Logger
+from .module_pool import FileCache
 from Levenshtein import distance
 
 shpext = ("shp", "dbf", "shx", "prj", "qpj", "qml", "qix", "idx", "dat", "sbn", "sbx", "fbn", "fbx", "ain", "aih",
@@ -121,27 +126,105 @@ def Haversine(lat1, lon1, lat2, lon2):
     return R * c
 
 
-def GetPixelSize(filename, um="m"):
+class RasterInfo:
     """
-    GetPixelSize
+    RasterInfo - the immutable header of a raster returned by DescribeRaster
+    (srs is shared between the callers, Clone() it before modifying it)
+    """
+    __slots__ = ("filename", "shape", "count", "dtypes", "nodata", "gt", "wkt", "srs",
+                 "pixelsize", "pixelsize_m", "extent", "blocksize", "compression", "overviews", "metadata")
+
+    def __init__(self, **kwargs):
+        for name in self.__slots__:
+            object.__setattr__(self, name, kwargs.get(name))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("RasterInfo is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("RasterInfo is immutable")
+
+    def __repr__(self):
+        return f"RasterInfo({self.filename}, shape={self.shape}, count={self.count}, dtypes={self.dtypes})"
+
+    def __reduce__(self):
+        # osr objects can not be pickled, the srs is rebuilt from the wkt
+        state = {name: getattr(self, name) for name in self.__slots__ if name != "srs"}
+        return RasterInfo.restore, (state,)
+
+    @staticmethod
+    def restore(state):
+        """
+        restore - unpickle a RasterInfo
+        """
+        return RasterInfo(srs=GetSpatialRef(state["wkt"]), **state)
+
+
+RASTER_INFO_CACHE = FileCache(maxsize=1024)
+
+
+def ReadRasterInfo(filename):
+    """
+    ReadRasterInfo - read the header of a raster with a single open
     """
     ds = OpenRaster(filename)
     if ds:
         m, n = ds.RasterYSize, ds.RasterXSize
-        minx, px, _, maxy, _, py = ds.GetGeoTransform()
-        prj = ds.GetProjection()
-        ds = None
-
-        # srs = osr.SpatialReference()
-        # srs.ImportFromProj4(prj)
-        srs = GetSpatialRef(prj)
-
-        if srs.IsGeographic() and um == "m":
+        gt, wkt = ds.GetGeoTransform(), ds.GetProjection()
+        bands = [ds.GetRasterBand(b) for b in range(1, ds.RasterCount + 1)]
+        structure = ds.GetMetadata("IMAGE_STRUCTURE") or {}
+        minx, px, _, maxy, _, py = gt
+        maxx = minx + n * px
+        miny = maxy + m * py
+        miny, maxy = min(miny, maxy), max(miny, maxy)
+
+        srs = GetSpatialRef(wkt)
+        if srs.IsGeographic():
             dx = Haversine(maxy, minx, maxy, minx + px * n) / n
             dy = Haversine(maxy, minx, maxy + m * py, minx) / m
-            return round(dx, 1), round(dy, 1)
+            pixelsize_m = round(dx, 1), round(dy, 1)
+        else:
+            pixelsize_m = px, abs(py)
+
+        info = RasterInfo(
+            filename=filename,
+            shape=(m, n),
+            count=ds.RasterCount,
+            dtypes=tuple(gdal.GetDataTypeName(band.DataType) for band in bands),
+            nodata=tuple(band.GetNoDataValue() for band in bands),
+            gt=tuple(gt),
+            wkt=wkt,
+            srs=srs,
+            pixelsize=(px, abs(py)),
+            pixelsize_m=pixelsize_m,
+            extent=(minx, miny, maxx, maxy),
+            blocksize=tuple(bands[0].GetBlockSize()) if bands else None,
+            compression=structure.get("COMPRESSION"),
+            overviews=bands[0].GetOverviewCount() if bands else 0,
+            metadata=tuple((ds.GetMetadata() or {}).items())
+        )
+        bands, ds = None, None
+        return info
+    return None
+
 
-        return px, abs(py)
+def DescribeRaster(filename):
+    """
+    DescribeRaster - the RasterInfo header of filename, memoized until the
+    file changes (mtime/size), None if it is not a raster
+    """
+    if not isinstance(filename, str):
+        return None
+    return RASTER_INFO_CACHE.get(filename, lambda: ReadRasterInfo(filename))
+
+
+def GetPixelSize(filename, um="m"):
+    """
+    GetPixelSize
+    """
+    info = DescribeRaster(filename)
+    if info:
+        return info.pixelsize_m if um == "m" else info.pixelsize
 
     return None, None
 
@@ -170,24 +253,139 @@ def GetDataType(filename):
     """
     GetDataType
     """
-    ds = OpenRaster(filename)
-    if ds:
-        band = ds.GetRasterBand(1)
-        dtype = gdal.GetDataTypeName(band.DataType)
-        ds = None
-        return dtype
+    info = DescribeRaster(filename)
+    if info and info.count:
+        return info.dtypes[0]
     return None
 
 
+class SrsIndex:
+    """
+    SrsIndex - the AutoIdentify lookup tables, loaded once per process from
+    data/srs_index.json.gz (see BuildSrsIndex):
+        hashes - md5 of the wkt -> authid
+        exact  - wkt or proj4 -> authid
+        names  - srs name -> [[authid, wkt], ...]
+    The hashes are stored per authority as the sorted codes and the first
+    digits hex digits of their md5 concatenated in the same order.
+    The identified wkt are memoized in a bounded LRU of maxsize entries.
+    """
+
+    def __init__(self, resource="data/srs_index.json.gz", digits=16, maxsize=1024):
+        self.resource = resource
+        self.digits = digits
+        self.maxsize = maxsize
+        self.tables = None
+        self.identified = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, name):
+        """
+        get - the table name, the index is loaded at the first call
+        """
+        if self.tables is None:
+            with self.lock:
+                if self.tables is None:
+                    self.tables = self.load()
+        return self.tables.get(name, {})
+
+    def load(self):
+        """
+        load - read the index from the package data
+        """
+        try:
+            index = json.loads(gzip.decompress(pkgutil.get_data(__name__, self.resource)).decode("utf-8"))
+        except Exception as ex:
+            Logger.error(f"SrsIndex: unable to load {self.resource}: {ex}")
+            return {}
+        hashes = {}
+        for authority, packed in index.get("hashes", {}).items():
+            md5 = packed["md5"]
+            for k, code in enumerate(packed["codes"]):
+                hashes[md5[k * self.digits:(k + 1) * self.digits]] = f"{authority}:{code}"
+        index["hashes"] = hashes
+        return index
+
+    def hash(self, wkt):
+        """
+        hash - the key of wkt in the hashes table
+        """
+        return md5text(wkt)[:self.digits]
+
+    def pack(self, hashes):
+        """
+        pack - the stored form of a {md5: authid} table
+        """
+        packed = {}
+        for hashcode, authid in sorted(hashes.items(), key=lambda item: item[1]):
+            authority, code = authid.split(":", 1)
+            item = packed.setdefault(authority, {"codes": [], "md5": []})
+            item["codes"].append(int(code) if code.isdigit() else code)
+            item["md5"].append(hashcode[:self.digits])
+        return {authority: {"codes": item["codes"], "md5": "".join(item["md5"])}
+                for authority, item in packed.items()}
+
+    def recall(self, wkt):
+        """
+        recall - the authid already identified for wkt
+        """
+        with self.lock:
+            code = self.identified.get(wkt)
+            if code:
+                self.identified.move_to_end(wkt)
+            return code
+
+    def remember(self, wkt, code):
+        """
+        remember - memoize the authid of wkt
+        """
+        with self.lock:
+            self.identified[wkt] = code
+            while len(self.identified) > self.maxsize:
+                self.identified.popitem(last=False)
+
+
+SRS_INDEX = SrsIndex()
+
+
+def BuildSrsIndex(fileout, pe_hash_list=None, spatial_ref_sys=None):
+    """
+    BuildSrsIndex - build the srs_index.json.gz shipped in data/ from the Esri
+    pe_hash_list.json and a spatial_ref_sys json {"CoordinateSystems":{authid:{name,wkt,proj4}}}
+    :param fileout: the index to write
+    :param pe_hash_list: the pe_hash_list.json, None to keep the hashes of the current index
+    :param spatial_ref_sys: the spatial_ref_sys json, None to keep the exact/names tables
+    """
+    hashes = SRS_INDEX.get("hashes")
+    index = {"exact": SRS_INDEX.get("exact"), "names": SRS_INDEX.get("names")}
+    if pe_hash_list:
+        with open(pe_hash_list, "r", encoding="utf-8") as stream:
+            hashes = json.load(stream).get("CoordinateSystems", {})
+    if spatial_ref_sys:
+        with open(spatial_ref_sys, "r", encoding="utf-8") as stream:
+            items = json.load(stream).get("CoordinateSystems", {})
+        index["exact"], index["names"] = {}, {}
+        for authid, srs in items.items():
+            # the first authid wins as in a linear scan
+            index["exact"].setdefault(srs["wkt"], authid)
+            index["exact"].setdefault(srs["proj4"], authid)
+            index["names"].setdefault(srs["name"], []).append([authid, srs["wkt"]])
+    index = {"hashes": SRS_INDEX.pack(hashes), **{name: table for name, table in index.items() if table}}
+    with open(fileout, "wb") as stream:
+        stream.write(gzip.compress(json.dumps(index, separators=(",", ":")).encode("utf-8"), 9))
+    return fileout
+
+
 def AutoIdentify(wkt):
     """
     AutoIdentify
     """
-    # get the file pe_hash_list.json from package data
+    # the lookup tables are loaded once from data/srs_index.json
     code = None
 
     if israster(wkt):
-        wkt = OpenRaster(wkt).GetProjection()
+        info = DescribeRaster(wkt)
+        wkt = info.wkt if info else None
     elif isshape(wkt) and isfile(forceext(wkt, "prj")):
         wkt = get(forceext(wkt, "prj"))
     elif isinstance(wkt, int):
@@ -212,6 +410,13 @@ def AutoIdentify(wkt):
         Logger.warning("The wkt is not a valid string or object")
         return None
 
+    if not wkt:
+        return None
+
+    code = SRS_INDEX.recall(wkt)
+    if code:
+        return code
+
     if not code:
         Logger.debug("1a) First chance to identify the wkt")
         srs = CRS.from_wkt(wkt)
@@ -220,35 +425,24 @@ def AutoIdentify(wkt):
 
     if not code:
         Logger.debug("1) First chance to identify the wkt")
-        pe_hash_list = json.loads(pkgutil.get_data(
-            __name__, "data/pe_hash_list.json").decode("utf-8"))
-        pe_hash_list = pe_hash_list["CoordinateSystems"] if "CoordinateSystems" in pe_hash_list else {
-        }
-        code = pe_hash_list.get(md5text(wkt), None)
+        code = SRS_INDEX.get("hashes").get(SRS_INDEX.hash(wkt))
 
     # last chance to identify the wkt
     if not code:
         Logger.debug("2) Second chance to identify the wkt")
-        spatial_res_sys_all = json.loads(pkgutil.get_data(
-            __name__, "data/spatial_ref_sys_all.json").decode("utf-8"))
-        spatial_res_sys_all = spatial_res_sys_all["CoordinateSystems"] if "CoordinateSystems" in spatial_res_sys_all else {
-        }
-        for authid, srs in spatial_res_sys_all.items():
-            if srs["wkt"] == wkt or srs["proj4"] == wkt:
-                code = authid
-                break
+        code = SRS_INDEX.get("exact").get(wkt)
 
     if not code:
         Logger.debug("3) Third chance to identify the wkt by the name")
-        candidates = []
-        for authid, srs in spatial_res_sys_all.items():
-            if srs["name"] == osr.SpatialReference(wkt).GetName():
-                candidates.append((authid, distance(srs["wkt"], wkt)))
+        name = osr.SpatialReference(wkt).GetName()
+        candidates = [(authid, distance(text, wkt)) for authid, text in SRS_INDEX.get("names").get(name, [])]
 
         #  sort by distance
         candidates = sorted(candidates, key=lambda x: x[1])
         code = candidates[0][0] if len(candidates) > 1 else None
 
+    if code:
+        SRS_INDEX.remember(wkt, code)
     return code
 
 
@@ -277,9 +471,10 @@ def isWkt(wkt):
     return False
 
 
-def GetSpatialRef(filename):
+def CreateSpatialRef(filename):
     """
-    GetSpatialRef
+    CreateSpatialRef - build a new osr.SpatialReference from an epsg code,
+    a proj4 or wkt string, a raster or a shapefile
     """
     srs = None
     if isinstance(filename, osr.SpatialReference):
@@ -317,14 +512,14 @@ def GetSpatialRef(filename):
         ds = OpenShape(filename)
         if ds:
             srs = ds.GetLayer().GetSpatialRef()
-            srs.AutoIdentifyEPSG()
+            if srs:
+                srs.AutoIdentifyEPSG()
 
     elif isinstance(filename, str) and israster(filename):
-        ds = OpenRaster(filename)
-        if ds:
-            wkt = ds.GetProjection()
+        info = DescribeRaster(filename)
+        if info:
             srs = osr.SpatialReference()
-            srs.ImportFromWkt(wkt)
+            srs.ImportFromWkt(info.wkt)
             srs.AutoIdentifyEPSG()
     else:
         srs = osr.SpatialReference()
@@ -332,14 +527,152 @@ def GetSpatialRef(filename):
     return srs
 
 
+class SpatialRefEntry:
+    """
+    SpatialRefEntry - a canonical srs with its precomputed equality key
+    """
+    __slots__ = ("srs", "key")
+
+    def __init__(self, srs):
+        object.__setattr__(self, "srs", srs)
+        object.__setattr__(self, "key", srs.ExportToProj4() if srs else None)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("SpatialRefEntry is immutable")
+
+    def __repr__(self):
+        return f"SpatialRefEntry({self.key})"
+
+
+class SpatialRefRegistry:
+    """
+    SpatialRefRegistry - a thread-safe registry interning epsg codes, proj4
+    and wkt strings, rasters and shapefiles (until their mtime/size change)
+    to canonical SpatialRefEntry, so SameSpatialRef compares two keys
+    """
+
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self.entries = {}
+        self.same = {}
+        self.files = FileCache(maxsize=maxsize)
+        self.lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def input_key(self, value):
+        """
+        input_key - the registry key of value, None for files
+        """
+        if isinstance(value, (int, np.integer)) and not isinstance(value, bool):
+            return "EPSG", int(value)
+        if isEPSG(value):
+            return "EPSG", int(value.split(":")[1])
+        if isProj4(value):
+            return "PROJ4", value
+        if isWkt(value):
+            return "WKT", md5text(value)
+        return None
+
+    def get(self, value):
+        """
+        get - the canonical SpatialRefEntry of value, None if it has no srs
+        """
+        if isinstance(value, osr.SpatialReference):
+            # a caller owned srs can change, never intern it
+            return SpatialRefEntry(value)
+
+        key = self.input_key(value)
+        if key is None:
+            if isinstance(value, str) and (isshape(value) or israster(value)):
+                return self.files.get(value, lambda: self.create(value), key="srs")
+            return SpatialRefEntry(osr.SpatialReference())
+
+        with self.lock:
+            if key in self.entries:
+                self.hits += 1
+                return self.entries[key]
+            self.misses += 1
+
+        entry = self.create(value if key[0] != "EPSG" else key[1])
+        if entry:
+            with self.lock:
+                if len(self.entries) >= self.maxsize:
+                    self.entries.clear()
+                entry = self.entries.setdefault(key, entry)
+        return entry
+
+    def create(self, value):
+        """
+        create - a new SpatialRefEntry of value
+        """
+        srs = CreateSpatialRef(value)
+        return SpatialRefEntry(srs) if srs else None
+
+    def is_same(self, entry1, entry2):
+        """
+        is_same - compare the equality keys, osr IsSame is computed once per pair
+        """
+        if entry1.key == entry2.key:
+            return True
+        pair = (entry1.key, entry2.key)
+        with self.lock:
+            if pair in self.same:
+                return self.same[pair]
+        same = bool(entry1.srs.IsSame(entry2.srs))
+        with self.lock:
+            if len(self.same) >= self.maxsize:
+                self.same.clear()
+            self.same[pair] = same
+            self.same[(entry2.key, entry1.key)] = same
+        return same
+
+    def clear(self):
+        """
+        clear - drop all the entries
+        """
+        with self.lock:
+            self.entries.clear()
+            self.same.clear()
+        self.files.clear()
+
+    def stats(self):
+        """
+        stats - hit/miss counters
+        """
+        with self.lock:
+            return {
+                "size": len(self.entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "files": self.files.stats()
+            }
+
+
+SPATIAL_REFS = SpatialRefRegistry()
+
+
+def GetSpatialRef(filename):
+    """
+    GetSpatialRef - a copy of the canonical srs of filename from SPATIAL_REFS
+    """
+    if isinstance(filename, osr.SpatialReference):
+        return filename
+    entry = SPATIAL_REFS.get(filename)
+    return entry.srs.Clone() if entry else None
+
+
 def SameSpatialRef(filename1, filename2):
     """
     SameSpatialRef
     """
-    srs1 = GetSpatialRef(filename1)
-    srs2 = GetSpatialRef(filename2)
-    if srs1 and srs2:
-        return srs1.IsSame(srs2) or srs1.ExportToProj4() == srs2.ExportToProj4()
+    entry1 = SPATIAL_REFS.get(filename1)
+    entry2 = SPATIAL_REFS.get(filename2)
+    if entry1 and entry2:
+        return SPATIAL_REFS.is_same(entry1, entry2)
     return None
 
 
@@ -382,6 +715,105 @@ def Rectangle(minx, miny, maxx, maxy, deltaperc=0.0):
     return poly
 
 
+class TransformationPool:
+    """
+    TransformationPool - a thread-safe cache of osr.CoordinateTransformation
+    keyed by the (source, target) srs equality keys and axis mappings,
+    geographic srs use the traditional GIS (lon, lat) axis order. Transformations are not shared
+    between threads.
+    """
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.items = OrderedDict()
+        self.lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.items)
+
+    def get(self, s_srs, t_srs):
+        """
+        get - the cached transformation from s_srs to t_srs
+        """
+        entry1, entry2 = SPATIAL_REFS.get(s_srs), SPATIAL_REFS.get(t_srs)
+        if not entry1 or not entry2:
+            return None
+        # never change the axis order of the canonical or the caller srs
+        srs1, srs2 = entry1.srs.Clone(), entry2.srs.Clone()
+        for srs in (srs1, srs2):
+            if srs.IsGeographic():
+                srs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+        # the equality key ignores the axis mapping, a caller srs can swap the axes
+        key = (entry1.key, tuple(srs1.GetDataAxisToSRSAxisMapping()),
+               entry2.key, tuple(srs2.GetDataAxisToSRSAxisMapping()), threading.get_ident())
+        with self.lock:
+            if key in self.items:
+                self.hits += 1
+                self.items.move_to_end(key)
+                return self.items[key]
+            self.misses += 1
+
+        transform = osr.CoordinateTransformation(srs1, srs2)
+        with self.lock:
+            self.items[key] = transform
+            while len(self.items) > self.maxsize:
+                self.items.popitem(last=False)
+        return transform
+
+    def clear(self):
+        """
+        clear - drop all the transformations
+        """
+        with self.lock:
+            self.items.clear()
+
+    def stats(self):
+        """
+        stats - hit/miss counters
+        """
+        with self.lock:
+            return {"size": len(self.items), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+
+TRANSFORMATIONS = TransformationPool()
+
+
+def GetTransformation(s_srs, t_srs):
+    """
+    GetTransformation - the cached osr.CoordinateTransformation from s_srs to t_srs
+    """
+    return TRANSFORMATIONS.get(s_srs, t_srs)
+
+
+def TransformPoints(xs, ys, s_srs, t_srs, chunksize=2**16):
+    """
+    TransformPoints - reproject the coordinate arrays xs, ys from s_srs to t_srs
+    :param chunksize: the number of points passed to osr in a single call
+    :return: the transformed xs, ys as float64 arrays with the input shape
+    """
+    xs = np.asarray(xs, dtype=np.float64)
+    ys = np.asarray(ys, dtype=np.float64)
+    if xs.shape != ys.shape:
+        Logger.error(f"TransformPoints: xs and ys have different shapes {xs.shape} and {ys.shape}")
+        return None, None
+    if SameSpatialRef(s_srs, t_srs):
+        return xs.copy(), ys.copy()
+
+    transform = GetTransformation(s_srs, t_srs)
+    if transform is None:
+        Logger.error("TransformPoints: invalid spatial reference")
+        return None, None
+
+    points = np.column_stack((xs.ravel(), ys.ravel()))
+    tx, ty = np.empty(points.shape[0]), np.empty(points.shape[0])
+    for j in range(0, points.shape[0], chunksize):
+        res = np.asarray(transform.TransformPoints(points[j:j + chunksize]), dtype=np.float64)
+        tx[j:j + chunksize], ty[j:j + chunksize] = res[:, 0], res[:, 1]
+    return tx.reshape(xs.shape), ty.reshape(ys.shape)
+
+
 def TransformBBOX(bbox, s_srs=None, t_srs=None):
     """
     TransformBBOX
@@ -390,14 +822,7 @@ def TransformBBOX(bbox, s_srs=None, t_srs=None):
     if SameSpatialRef(s_srs, t_srs):
         return bbox
 
-    s_srs = GetSpatialRef(s_srs)
-    t_srs = GetSpatialRef(t_srs)
-    if s_srs and s_srs.IsGeographic():
-        s_srs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
-    if t_srs and t_srs.IsGeographic():
-        t_srs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
-
-    transform = osr.CoordinateTransformation(s_srs, t_srs)
+    transform = GetTransformation(s_srs, t_srs)
     # rect = Rectangle(s_minx, s_miny, s_maxx, s_maxy)
     # rect.Transform(transform)
     # t_minx, t_maxx, t_miny, t_maxy = rect.GetEnvelope()
@@ -407,9 +832,9 @@ def TransformBBOX(bbox, s_srs=None, t_srs=None):
         s_minx, s_miny, s_maxx, s_maxy, 2)
 
     # patch for EPSG:6876
-    if SameSpatialRef(t_srs, GetSpatialRef(6876)):
+    if SameSpatialRef(t_srs, 6876):
         minx, miny, maxx, maxy = miny, minx, maxy, maxx
-    elif SameSpatialRef(t_srs, GetSpatialRef(3035)):
+    elif SameSpatialRef(t_srs, 3035):
         minx, miny, maxx, maxy = miny, minx, maxy, maxx
 
     return minx, miny, maxx, maxy
@@ -437,19 +862,12 @@ def GetExtent(filename, t_srs=None):
         minx, maxx, miny, maxy = filename.GetEnvelope()
         s_srs = filename.GetSpatialReference()
     elif israster(filename):
-        ds = OpenRaster(filename)
-        if ds:
+        info = DescribeRaster(filename)
+        if info:
             "{xmin} {ymin} {xmax} {ymax}"
-            m, n = ds.RasterYSize, ds.RasterXSize
-            gt = ds.GetGeoTransform()
-            minx, px, _, maxy, _, py = gt
-            maxx = minx + n * px
-            miny = maxy + m * py
-            miny, maxy = min(miny, maxy), max(miny, maxy)
-            wkt = ds.GetProjection()
+            minx, miny, maxx, maxy = info.extent
             s_srs = osr.SpatialReference()
-            s_srs.ImportFromWkt(wkt)
-            ds = None
+            s_srs.ImportFromWkt(info.wkt)
 
     elif isshape(filename):
 
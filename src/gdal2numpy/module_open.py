@@ -28,6 +28,7 @@ from .filesystem import filetostr, normshape
 from .module_log import Logger
 from .module_s3 import isshape, s3_get
 from .module_http import http_get
+from .module_pool import PooledOpen
 
 def get(uri):
     """
@@ -51,17 +52,17 @@ def OpenShape(fileshp, exclusive=False):
         ds = None
     elif isinstance(fileshp, str) and fileshp.startswith("http")  and ".shp" in fileshp.lower():
         Logger.debug(f"1) Inspect file from https...")
-        fileshp = normshape(fileshp)
-        ds = ogr.Open(f"/vsicurl/{fileshp}", exclusive)
+        fileshp = f"/vsicurl/{normshape(fileshp)}"
+        ds = PooledOpen(fileshp, exclusive, lambda: ogr.Open(fileshp, exclusive))
     elif isinstance(fileshp, str) and os.path.isfile(fileshp) and ".shp" in fileshp.lower():
         Logger.debug(f"2) Opening local {fileshp}...")
         fileshp = normshape(fileshp)
-        ds = ogr.Open(fileshp, exclusive)
+        ds = PooledOpen(fileshp, exclusive, lambda: ogr.Open(fileshp, exclusive))
     elif isinstance(fileshp, str) and isshape(fileshp):
         Logger.debug(f"3) Get file from s3...")
         fileshp = fileshp.replace("s3://", "/vsis3/")
         fileshp = normshape(fileshp)
-        ds = ogr.Open(fileshp, exclusive)
+        ds = PooledOpen(fileshp, exclusive, lambda: ogr.Open(fileshp, exclusive))
     elif isinstance(fileshp, ogr.DataSource) and GetAccess(fileshp) >= exclusive:
         Logger.debug(f"4) Dataset already open...")
         ds = fileshp
@@ -128,5 +129,5 @@ def OpenRaster(filename, update=0):
     else:
         return None
     
-    ds = ds if isinstance(filename, gdal.Dataset) else gdal.Open(filename, update)
+    ds = ds if isinstance(filename, gdal.Dataset) else PooledOpen(filename, update, lambda: gdal.Open(filename, update))
     return ds
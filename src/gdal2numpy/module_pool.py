@@ -0,0 +1,253 @@
+# -------------------------------------------------------------------------------
+# Licence:
+# Copyright (c) 2012-2026 Luzzi Valerio
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+#
+# Name:        module_pool.py
+# Purpose:
+#
+# Author:      Luzzi Valerio
+#
+# Created:     18/10/2026
+# -------------------------------------------------------------------------------
+import os
+import time
+import threading
+from collections import OrderedDict
+from osgeo import gdal
+from .module_log import Logger
+
+# the pools activated by "with DatasetPool():", the last one is in use
+ACTIVE_POOLS = []
+# the FileCache instances to invalidate when a file is written
+FILE_CACHES = []
+
+
+def normvsi(pathname):
+    """
+    normvsi - the GDAL virtual path of s3:// and http(s):// uris
+    """
+    if not isinstance(pathname, str):
+        return pathname
+    if pathname.startswith("s3://"):
+        return pathname.replace("s3://", "/vsis3/", 1)
+    if pathname.startswith("http"):
+        return f"/vsicurl/{pathname}"
+    return pathname
+
+
+def file_version(pathname, refresh=False):
+    """
+    file_version - (mtime, size) of a local or /vsi file, None if it does not exist
+    /vsis3/ and /vsicurl/ stats are cached by GDAL so they cost at most one HEAD,
+    refresh=True drops the GDAL cache of a remote file to see changes made elsewhere
+    """
+    if isinstance(pathname, str) and os.path.isfile(pathname):
+        stat = os.stat(pathname)
+        return stat.st_mtime_ns, stat.st_size
+    if refresh and isinstance(pathname, str) and pathname.startswith("/vsi"):
+        gdal.VSICurlPartialClearCache(pathname)
+    stat = gdal.VSIStatL(pathname) if isinstance(pathname, str) else None
+    return (stat.mtime, stat.size) if stat else None
+
+
+class FileCache:
+    """
+    FileCache - a thread-safe, bounded LRU memo of values computed from a
+    file, an entry is recomputed when the file mtime/size change.
+    The mtime/size of a remote file are checked again on the server once
+    every ttl seconds, in between only InvalidateCaches drops its entries
+    """
+
+    def __init__(self, maxsize=1024, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.items = OrderedDict()
+        self.lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        FILE_CACHES.append(self)
+
+    def __len__(self):
+        return len(self.items)
+
+    def get(self, pathname, compute, key=None):
+        """
+        get - the cached value of pathname or compute() it, None is not cached
+        """
+        key = (normvsi(pathname), key)
+        with self.lock:
+            checked = self.items[key][2] if key in self.items else None
+        refresh = checked is None or time.monotonic() - checked > self.ttl
+        version = file_version(normvsi(pathname), refresh)
+        with self.lock:
+            if key in self.items and self.items[key][0] == version:
+                self.hits += 1
+                self.items.move_to_end(key)
+                if refresh:
+                    self.items[key] = self.items[key][:2] + (time.monotonic(),)
+                return self.items[key][1]
+            self.misses += 1
+
+        value = compute()
+        if value is not None and version is not None:
+            with self.lock:
+                self.items[key] = (version, value, time.monotonic())
+                while len(self.items) > self.maxsize:
+                    self.items.popitem(last=False)
+        return value
+
+    def invalidate(self, pathname):
+        """
+        invalidate - drop the entries of pathname
+        """
+        pathname = normvsi(pathname)
+        with self.lock:
+            for key in [key for key in self.items if key[0] == pathname]:
+                del self.items[key]
+
+    def clear(self):
+        """
+        clear - drop all the entries
+        """
+        with self.lock:
+            self.items.clear()
+
+    def stats(self):
+        """
+        stats - hit/miss counters
+        """
+        with self.lock:
+            return {"size": len(self.items), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+
+class DatasetPool:
+    """
+    DatasetPool - a thread-safe, bounded LRU pool of the read-only
+    gdal.Dataset/ogr.DataSource handles opened by OpenRaster and OpenShape
+
+        with DatasetPool(maxsize=64) as pool:
+            RasterLike(filename, filetpl, fileout)
+            print(pool.stats())
+
+    Handles are never shared between threads, entries are dropped when the
+    file mtime/size change, when the file is opened in update mode or
+    written by s3_upload/s3_copy/s3_move/s3_remove.
+    """
+
+    def __init__(self, maxsize=64):
+        self.maxsize = maxsize
+        self.items = OrderedDict()
+        self.lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def __enter__(self):
+        ACTIVE_POOLS.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self in ACTIVE_POOLS:
+            ACTIVE_POOLS.remove(self)
+        self.clear()
+
+    def __len__(self):
+        return len(self.items)
+
+    def get(self, pathname, mode, opener):
+        """
+        get - the pooled handle of pathname or a new one from opener()
+        """
+        key = (pathname, mode, threading.get_ident())
+        version = file_version(pathname)
+        with self.lock:
+            if key in self.items:
+                ds, cached_version = self.items[key]
+                if cached_version == version:
+                    self.hits += 1
+                    self.items.move_to_end(key)
+                    return ds
+                Logger.debug(f"DatasetPool: {pathname} changed, reopening")
+                del self.items[key]
+                self.invalidations += 1
+            self.misses += 1
+
+        ds = opener()
+        if ds:
+            with self.lock:
+                self.items[key] = (ds, version)
+                while len(self.items) > self.maxsize:
+                    self.items.popitem(last=False)
+        return ds
+
+    def invalidate(self, pathname):
+        """
+        invalidate - drop all the handles of pathname
+        """
+        pathname = normvsi(pathname)
+        with self.lock:
+            keys = [key for key in self.items if key[0] == pathname]
+            for key in keys:
+                del self.items[key]
+            self.invalidations += len(keys)
+
+    def clear(self):
+        """
+        clear - drop all the handles
+        """
+        with self.lock:
+            self.items.clear()
+
+    def stats(self):
+        """
+        stats - hit/miss counters
+        """
+        with self.lock:
+            return {
+                "size": len(self.items),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations
+            }
+
+
+def PooledOpen(pathname, mode, opener):
+    """
+    PooledOpen - open pathname through the active DatasetPool if any.
+    Update mode opens are never pooled and invalidate the cached entries.
+    """
+    pool = ACTIVE_POOLS[-1] if ACTIVE_POOLS else None
+    if mode:
+        InvalidateCaches(pathname)
+        return opener()
+    if pool is None:
+        return opener()
+    return pool.get(pathname, mode, opener)
+
+
+def InvalidateCaches(pathname):
+    """
+    InvalidateCaches - drop pathname from the active pools and the file caches
+    """
+    pathname = normvsi(pathname)
+    if isinstance(pathname, str) and pathname.startswith("/vsi"):
+        # forget the cached stat and blocks of the remote file
+        gdal.VSICurlPartialClearCache(pathname)
+    for pool in ACTIVE_POOLS:
+        pool.invalidate(pathname)
+    for cache in FILE_CACHES:
+        cache.invalidate(pathname)
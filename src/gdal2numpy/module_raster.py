@@ -0,0 +1,171 @@
+# -------------------------------------------------------------------------------
+# Licence:
+# Copyright (c) 2012-2026 Luzzi Valerio
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+#
+# Name:        module_raster.py
+# Purpose:
+#
+# Author:      Luzzi Valerio
+#
+# Created:     18/10/2026
+# -------------------------------------------------------------------------------
+from collections import OrderedDict
+import numpy as np
+from osgeo import gdal
+from .module_open import OpenRaster
+from .module_log import Logger
+from .module_GDAL2Numpy import BBoxWindow, translate_nodata, data_type_of
+
+
+class Raster:
+    """
+    Raster - a lazy raster array on top of OpenRaster: shape, dtype, gt, prj
+    and nodata are read from the header, pixels only when sliced
+        r = Raster(filetif)
+        data = r[1000:2000, 500:900]
+        data, gt = r.window(bbox, bbox_srs)
+    """
+
+    def __init__(self, filename, band=1, dtype=np.float32, load_nodata_as=np.nan, cache=0):
+        """
+        Raster
+        :param cache: the number of decoded blocks to keep in memory, 0 disables the cache
+        """
+        self.filename = filename
+        self.ds = OpenRaster(filename)
+        if not self.ds:
+            raise FileNotFoundError(f"file <{filename}> not exists!")
+        self.band = self.ds.GetRasterBand(band)
+        self.gt = self.ds.GetGeoTransform()
+        self.prj = self.ds.GetProjection()
+        self.nodata = self.band.GetNoDataValue()
+        self.native = data_type_of[gdal.GetDataTypeName(self.band.DataType)]
+        self.dtype = np.dtype(dtype) if dtype else np.dtype(self.native)
+        self.load_nodata_as = load_nodata_as
+        self.blocksize = tuple(self.band.GetBlockSize())
+        self.cache = cache
+        self.blocks = OrderedDict()
+
+    @property
+    def shape(self):
+        """
+        shape - (rows, cols)
+        """
+        return self.ds.RasterYSize, self.ds.RasterXSize
+
+    def __len__(self):
+        return self.ds.RasterYSize
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """
+        close - release the dataset and the cached blocks
+        """
+        self.blocks.clear()
+        self.band, self.ds = None, None
+
+    def __array__(self, dtype=None, copy=None):
+        data = self.read(0, 0, self.ds.RasterXSize, self.ds.RasterYSize)
+        return data.astype(dtype, copy=False) if dtype else data
+
+    def __getitem__(self, key):
+        """
+        __getitem__ - r[i0:i1, j0:j1] reads just the window
+        """
+        key = key if isinstance(key, tuple) else (key, slice(None))
+        if len(key) != 2:
+            raise IndexError(f"Raster is 2-dimensional, got {len(key)} indices")
+        m, n = self.shape
+        ranges, squeeze = [], []
+        for k, size in zip(key, (m, n)):
+            if isinstance(k, slice):
+                start, stop, step = k.indices(size)
+                if step < 0:
+                    raise IndexError("Raster does not support negative steps")
+                ranges.append((start, max(start, stop), step))
+                squeeze.append(False)
+            elif isinstance(k, (int, np.integer)):
+                k = k + size if k < 0 else k
+                if not 0 <= k < size:
+                    raise IndexError(f"index {k} is out of bounds for axis with size {size}")
+                ranges.append((k, k + 1, 1))
+                squeeze.append(True)
+            else:
+                raise TypeError(f"Raster indices must be integers or slices, not {type(k)}")
+
+        (i0, i1, si), (j0, j1, sj) = ranges
+        data = self.read(j0, i0, j1 - j0, i1 - i0)[::si, ::sj]
+        if squeeze[0] and squeeze[1]:
+            return data[0, 0]
+        if squeeze[0]:
+            return data[0]
+        if squeeze[1]:
+            return data[:, 0]
+        return data
+
+    def window(self, bbox, bbox_srs=None):
+        """
+        window - read the window covering bbox
+        :return: data, gt
+        """
+        m, n = self.shape
+        (j0, i0, cols, rows), gt = BBoxWindow(bbox, self.gt, m, n, bbox_srs, self.prj)
+        return self.read(j0, i0, cols, rows), gt
+
+    def read(self, j0, i0, cols, rows):
+        """
+        read - read the window (j0, i0, cols, rows) translating the nodata
+        """
+        if cols <= 0 or rows <= 0:
+            return np.empty((max(rows, 0), max(cols, 0)), dtype=self.dtype)
+        if not self.cache:
+            data = self.band.ReadAsArray(j0, i0, cols, rows)
+            return translate_nodata(data, self.nodata, self.dtype, self.load_nodata_as)
+
+        # assemble the window from the cached blocks
+        bx, by = self.blocksize
+        data = np.empty((rows, cols), dtype=self.dtype)
+        for bi in range(i0 // by, (i0 + rows - 1) // by + 1):
+            for bj in range(j0 // bx, (j0 + cols - 1) // bx + 1):
+                block = self.get_block(bi, bj)
+                # intersection of the block with the window
+                ia, ib = max(i0, bi * by), min(i0 + rows, bi * by + block.shape[0])
+                ja, jb = max(j0, bj * bx), min(j0 + cols, bj * bx + block.shape[1])
+                data[ia - i0:ib - i0, ja - j0:jb - j0] = block[ia - bi * by:ib - bi * by, ja - bj * bx:jb - bj * bx]
+        return data
+
+    def get_block(self, bi, bj):
+        """
+        get_block - the decoded block (bi, bj) from the LRU cache
+        """
+        if (bi, bj) in self.blocks:
+            self.blocks.move_to_end((bi, bj))
+            return self.blocks[(bi, bj)]
+        m, n = self.shape
+        bx, by = self.blocksize
+        cols, rows = min(bx, n - bj * bx), min(by, m - bi * by)
+        block = self.band.ReadAsArray(bj * bx, bi * by, cols, rows)
+        block = translate_nodata(block, self.nodata, self.dtype, self.load_nodata_as)
+        self.blocks[(bi, bj)] = block
+        while len(self.blocks) > self.cache:
+            self.blocks.popitem(last=False)
+        Logger.debug(f"Raster: read block {(bi, bj)} of {self.filename}")
+        return block
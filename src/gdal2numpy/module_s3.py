@@ -31,6 +31,8 @@ from pathlib import Path
 from botocore.exceptions import ClientError, NoCredentialsError
 from .filesystem import *
 from .module_http import http_exists
+from osgeo import gdal
+from .module_pool import InvalidateCaches, normvsi
 from .module_log import Logger
 
 
@@ -213,6 +215,7 @@ def s3_upload(filename, uri, remove_src=False, client=None):
                 client.upload_file(Filename=filename,
                                    Bucket=bucket_name, Key=key,
                                    ExtraArgs=extra_args)
+                InvalidateCaches(uri)
                 
                 
             if remove_src:
@@ -304,6 +307,7 @@ def s3_remove(uri, filter=None, client=None):
         if bucket_name and filepath and filter is None:
             client = get_client(client)
             client.delete_object(Bucket=bucket_name, Key=filepath)
+            InvalidateCaches(uri)
             res = True
         elif bucket_name and filepath and filter:
             client = get_client(client)
@@ -333,6 +337,7 @@ def s3_copy(src, dst, client=None):
             if s3_exists(src, client):
                 client.copy_object(Bucket=dst_bucket_name, Key=dst_filepath,
                                CopySource={'Bucket': src_bucket_name, 'Key': src_filepath})
+                InvalidateCaches(dst)
             res = True
     except ClientError as ex:
         Logger.error("!!!")
@@ -353,6 +358,8 @@ def s3_move(src, dst, client=None):
             client.copy_object(Bucket=dst_bucket_name, Key=dst_filepath,
                                CopySource={'Bucket': src_bucket_name, 'Key': src_filepath})
             client.delete_object(Bucket=src_bucket_name, Key=src_filepath)
+            InvalidateCaches(src)
+            InvalidateCaches(dst)
             res = True
     except ClientError as ex:
         Logger.error(ex)
@@ -438,6 +445,61 @@ def copy(src, dst=None, client=None):
 
     return dst
 
+def GDALPaths(filelist, tmpdir=None):
+    """
+    GDALPaths - the paths to let GDAL read filelist in place: local files as
+    they are, s3:// and http(s):// as /vsis3/ and /vsicurl/ (range reads of
+    the blocks needed). Only the files GDAL can not open in place are copied.
+    :return: the paths and the local copies to remove when done
+    """
+    paths, copies = [], []
+    for filename in listify(filelist):
+        path = normvsi(filename)
+        if not isinstance(path, str) or os.path.isfile(path):
+            paths.append(path)
+            continue
+        try:
+            gdal.PushErrorHandler("CPLQuietErrorHandler")
+            ds = gdal.OpenEx(path)
+        except Exception:
+            ds = None
+        finally:
+            gdal.PopErrorHandler()
+        if ds:
+            paths.append(path)
+        else:
+            Logger.debug(f"GDALPaths: unable to read {filename} in place, copying it")
+            filetmp = copy(filename, f"{tmpdir}/{justfname(filename)}" if tmpdir else None)
+            paths.append(filetmp)
+            copies.append(filetmp)
+        ds = None
+    return paths, copies
+
+
+class VSICache:
+    """
+    VSICache - enable the GDAL block cache of the /vsi files opened in a block
+        with VSICache(256 * 1024 * 1024):
+            gdalwarp(...)
+    """
+
+    def __init__(self, size=None):
+        self.size = size
+        self.saved = {}
+
+    def __enter__(self):
+        if self.size:
+            for key, value in (("VSI_CACHE", "TRUE"), ("VSI_CACHE_SIZE", str(int(self.size)))):
+                self.saved[key] = gdal.GetConfigOption(key)
+                gdal.SetConfigOption(key, value)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        for key, value in self.saved.items():
+            gdal.SetConfigOption(key, value)
+        self.saved = {}
+
+
 def move(src, dst, client=None):
     """
     move
@@ -0,0 +1,54 @@
+# -------------------------------------------------------------------------------
+# Licence:
+# Copyright (c) 2012-2026 Luzzi Valerio
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+#
+# Name:        module_tiles.py
+# Purpose:     the tiles and the workers of the tiled gdalwarp, gdal_merge,
+#              RasterLikeMany and RasterizeLike
+#
+# Author:      Luzzi Valerio
+#
+# Created:     18/10/2026
+# -------------------------------------------------------------------------------
+from osgeo import gdal
+
+
+def worker_init(cachemax):
+    """
+    worker_init - limit the GDAL block cache of a worker process (MB)
+    """
+    if cachemax:
+        gdal.SetCacheMax(int(cachemax) * 1024 * 1024)
+
+
+def tile_windows(m, n, tilesize):
+    """
+    tile_windows - the (j0, i0, cols, rows) tiles covering a m x n grid
+    """
+    for i0 in range(0, m, tilesize):
+        for j0 in range(0, n, tilesize):
+            yield j0, i0, min(tilesize, n - j0), min(tilesize, m - i0)
+
+
+def tile_bbox(gt, window):
+    """
+    tile_bbox - the (minx, miny, maxx, maxy) of a window of the grid gt
+    """
+    j0, i0, cols, rows = window
+    x0, px, _, y0, _, py = gt
+    minx, maxx = x0 + j0 * px, x0 + (j0 + cols) * px
+    miny, maxy = sorted((y0 + i0 * py, y0 + (i0 + rows) * py))
+    return minx, miny, maxx, maxy
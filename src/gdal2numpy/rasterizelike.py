@@ -22,16 +22,19 @@
 #
 # Created:     28/02/2022
 # -------------------------------------------------------------------------------
+import os
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor
 from osgeo import gdal
-from osgeo import ogr, osr
-from .module_features import GetNumericFieldNames, Transform
-from .module_s3 import copy, iss3
+from osgeo import ogr
+from .module_s3 import copy, iss3, move, tempname4S3
+from .filesystem import justpath, remove
 from .module_open import OpenRaster
 from .module_open import OpenShape
 from .module_log import Logger
-from .module_ogr import GetSpatialRef, SameSpatialRef
-from .module_Numpy2GTiff import Numpy2GTiff
+from .module_ogr import GetSpatialRef, SameSpatialRef, TransformBBOX
+from .module_meta import compute_statistics
+from .module_tiles import tile_windows, tile_bbox
 
 dtypeOf = {
     "byte": gdal.GDT_Byte,
@@ -63,18 +66,239 @@ dtypeOf = {
     np.float64: gdal.GDT_Float64,
 }
 
+def burn_specs(burn_fieldname=None, z_value=None, factor=1.0):
+    """
+    burn_specs - the (fieldname, z_value, factor) to burn in each band,
+    burn_fieldname can be a list of fieldnames and (z_value, factor) tuples
+    """
+    if not isinstance(burn_fieldname, list):
+        return [(burn_fieldname if burn_fieldname else "FID", z_value, factor)]
+    specs = []
+    for item in burn_fieldname:
+        if isinstance(item, str):
+            specs.append((item, z_value, factor))
+        elif isinstance(item, (tuple, list)):
+            specs.append((None, item[0], item[1] if len(item) > 1 else 1.0))
+        else:
+            specs.append((None, item, 1.0))
+    return specs
+
+
+def rasterize_source(vector, t_srs, specs, buf=0.0, bbox=None):
+    """
+    rasterize_source - copy the layer of vector in memory with a single
+    gdal.VectorTranslate: reprojected to t_srs once for the whole layer, with
+    a FID field and a BURN<k> field for each band k burning an attribute
+    (premultiplied by its factor), then polygons are buffered by buf in the
+    units of t_srs
+    :param vector: the shapefile pathname or its open DataSource
+    :param specs: the burn_specs of the bands
+    :param bbox: copy just the features intersecting bbox, in t_srs
+    :return: the Memory dataset
+    """
+    # gdal.VectorTranslate takes a gdal.Dataset, not an ogr.DataSource
+    if isinstance(vector, ogr.DataSource):
+        vector = vector.GetName()
+    if isinstance(vector, str):
+        vector = gdal.OpenEx(vector, gdal.OF_VECTOR)
+    if vector is None:
+        Logger.error("rasterize_source: unable to open the vector dataset")
+        return None
+    vlayer = vector.GetLayer()
+    layername = vlayer.GetName()
+    layer_defn = vlayer.GetLayerDefn()
+    numeric = (ogr.OFTInteger, ogr.OFTInteger64, ogr.OFTReal)
+    fieldnames = [layer_defn.GetFieldDefn(j).GetName() for j in range(layer_defn.GetFieldCount())
+                  if layer_defn.GetFieldDefn(j).GetType() in numeric]
+    polygons = ogr.GT_Flatten(vlayer.GetGeomType()) in (ogr.wkbPolygon, ogr.wkbMultiPolygon)
+    buffering = buf > 0 and polygons
+
+    columns = ['FID AS "FID"']
+    for k, (fieldname, z_value, factor) in enumerate(specs, 1):
+        # burn the field value, multiplied by factor if it is not 1
+        if factor != 0.0 and (factor != 1.0 or z_value is None):
+            value = "FID" if fieldname == "FID" else f'"{fieldname}"' if fieldname in fieldnames else None
+            if value:
+                scale = f" * {factor}" if factor != 1.0 else ""
+                columns.append(f'{value}{scale} AS "BURN{k}"')
+    sql = f'SELECT {", ".join(columns)} FROM "{layername}"'
+
+    kwargs = {
+        "format": "Memory",
+        "SQLStatement": sql,
+        "SQLDialect": "OGRSQL",
+        "layerName": layername,
+    }
+    s_srs = vlayer.GetSpatialRef()
+    if bbox:
+        # the features up to buf outside bbox reach it once buffered
+        minx, miny, maxx, maxy = bbox
+        bbox = (minx - buf, miny - buf, maxx + buf, maxy + buf) if buffering else bbox
+        # -spat_srs can not be used with -sql, the filter is in the srs of the layer
+        kwargs["spatFilter"] = list(TransformBBOX(bbox, t_srs, s_srs) if s_srs else bbox)
+    if s_srs and not SameSpatialRef(s_srs, t_srs):
+        kwargs["dstSRS"] = GetSpatialRef(t_srs).ExportToWkt()
+        kwargs["reproject"] = True
+
+    Logger.debug(f"rasterize_source: {sql}")
+    source = gdal.VectorTranslate("memData", vector, **kwargs)
+    if source is None:
+        Logger.error(f"rasterize_source: unable to copy the layer {layername}")
+    elif buffering:
+        # buffer after the reprojection, so buf is in the units of t_srs
+        layer = source.GetLayer()
+        for feature in layer:
+            geom = feature.GetGeometryRef()
+            if geom is not None:
+                feature.SetGeometry(geom.Buffer(buf))
+                layer.SetFeature(feature)
+        layer.ResetReading()
+        layer = None
+    return source
+
+
+def burn_layer(target_ds, layer, specs, all_touched=False):
+    """
+    burn_layer - rasterize the layer made by rasterize_source into the bands of target_ds
+    """
+    layer_defn = layer.GetLayerDefn()
+    fieldnames = [layer_defn.GetFieldDefn(j).GetName() for j in range(layer_defn.GetFieldCount())]
+    for k, (fieldname, z_value, factor) in enumerate(specs, 1):
+        if factor == 0.0:
+            # if factor is 0 then burn 0, may be this does not have much sense
+            gdal.RasterizeLayer(target_ds, [k], layer, burn_values=[0.0], options=[f"ALL_TOUCHED={all_touched}"])
+        elif f"BURN{k}" in fieldnames:
+            # burn the field value, already multiplied by factor in rasterize_source
+            gdal.RasterizeLayer(target_ds, [k], layer, options=[f"ATTRIBUTE=BURN{k}", f"ALL_TOUCHED={all_touched}"])
+        elif z_value is not None:
+            # in case we hav not fieldname we burn the z_value
+            gdal.RasterizeLayer(target_ds, [k], layer, burn_values=[z_value*factor], options=[f"ALL_TOUCHED={all_touched}"])
+        else:
+            # in all other cases we burn 1
+            gdal.RasterizeLayer(target_ds, [k], layer, burn_values=[1], options=[f"ALL_TOUCHED={all_touched}"])
+
+
+def rasterize_tile(layer, window, gt, prj, dtype, nodata, specs, all_touched):
+    """
+    rasterize_tile - rasterize the features of layer intersecting window in a MEM tile
+    :return: a (bands, rows, cols) array
+    """
+    j0, i0, cols, rows = window
+    x0, px, rx, y0, ry, py = gt
+    tile = gdal.GetDriverByName("MEM").Create("", cols, rows, len(specs), dtype)
+    tile.SetGeoTransform((x0 + j0 * px, px, rx, y0 + i0 * py, ry, py))
+    tile.SetProjection(prj)
+    for k in range(1, len(specs) + 1):
+        band = tile.GetRasterBand(k)
+        band.SetNoDataValue(nodata)
+        band.Fill(nodata)
+    layer.SetSpatialFilterRect(*tile_bbox(gt, window))
+    burn_layer(tile, layer, specs, all_touched)
+    layer.SetSpatialFilter(None)
+    data = tile.ReadAsArray().reshape(len(specs), rows, cols)
+    band, tile = None, None
+    return data
+
+
+def rasterize_task(fileshp, windows, gt, prj, dtype, nodata, specs, buf, all_touched):
+    """
+    rasterize_task - rasterize some tiles in a worker process, each worker
+    copies just the features intersecting its tiles
+    :return: a list of (window, data) or None
+    """
+    bbox = [tile_bbox(gt, window) for window in windows]
+    bbox = min(b[0] for b in bbox), min(b[1] for b in bbox), max(b[2] for b in bbox), max(b[3] for b in bbox)
+    source = rasterize_source(fileshp, prj, specs, buf, bbox=bbox)
+    if source is None:
+        return None
+    layer = source.GetLayer()
+    res = [(window, rasterize_tile(layer, window, gt, prj, dtype, nodata, specs, all_touched))
+           for window in windows]
+    layer, source = None, None
+    return res
+
+
+def RasterizeTiles(fileshp, fileout, m, n, gt, prj, dtype, nodata, specs, buf=0.0, all_touched=False,
+                   tilesize=2048, workers=1):
+    """
+    RasterizeTiles - rasterize tile by tile straight into the fileout GTiff,
+    the memory peak is a few tiles whatever the size of the template
+    :param fileshp: the shapefile path as opened by OpenShape
+    :param specs: the burn_specs of the bands
+    :param workers: the number of worker processes, each one copies the features of its tiles
+    :return: fileout or None
+    """
+    options = ["BIGTIFF=YES", "TILED=YES", "BLOCKXSIZE=256", "BLOCKYSIZE=256", "COMPRESS=LZW"]
+    os.makedirs(justpath(fileout) or ".", exist_ok=True)
+    target_ds = gdal.GetDriverByName("GTiff").Create(fileout, n, m, len(specs), dtype, options)
+    target_ds.SetGeoTransform(gt)
+    target_ds.SetProjection(prj)
+    bands = [target_ds.GetRasterBand(k) for k in range(1, len(specs) + 1)]
+    for band in bands:
+        band.SetNoDataValue(nodata)
+
+    def write(window, data):
+        for band, tile in zip(bands, data):
+            band.WriteArray(tile, window[0], window[1])
+
+    windows = list(tile_windows(m, n, tilesize))
+    done = True
+    if workers and workers > 1 and len(windows) > 1:
+        # a strip of tiles per task, at most 2 tasks per worker in memory
+        tasks = [windows[k:k + 4] for k in range(0, len(windows), 4)]
+        args = (gt, prj, dtype, nodata, specs, buf, all_touched)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for k in range(0, len(tasks), 2 * workers):
+                futures = [executor.submit(rasterize_task, fileshp, task, *args) for task in tasks[k:k + 2 * workers]]
+                for future in futures:
+                    res = future.result()
+                    done = done and res is not None
+                    for window, data in res or []:
+                        write(window, data)
+    else:
+        # a single reprojected copy of the layer, filtered tile by tile
+        source = rasterize_source(fileshp, prj, specs, buf)
+        done = source is not None
+        if done:
+            layer = source.GetLayer()
+            for window in windows:
+                write(window, rasterize_tile(layer, window, gt, prj, dtype, nodata, specs, all_touched))
+            layer, source = None, None
+
+    if not done:
+        bands, target_ds = None, None
+        remove(fileout)
+        Logger.error(f"RasterizeTiles: unable to rasterize <{fileshp}>")
+        return None
+
+    target_ds.FlushCache()
+    for band in bands:
+        compute_statistics(band)
+    bands, target_ds = None, None
+    return fileout
+
+
 def RasterizeLike(fileshp, filedem, fileout="", dtype=None, burn_fieldname=None, \
-                  z_value=None, factor=1.0, nodata=None, buf=0.0, all_touched=False):
+                  z_value=None, factor=1.0, nodata=None, buf=0.0, all_touched=False,
+                  tilesize=None, workers=1, return_array=True):
     """
     RasterizeLike - Rasterize a shapefile like a raster file
+    :param burn_fieldname: the field to burn, or a list of fields and (z_value, factor)
+        tuples to burn in a multi-band output with a single copy of the layer,
+        then data is a (bands, rows, cols) array
+    :param return_array: when fileout is given, False skips reading back the
+        rasterized file and the returned data is None
+    :param tilesize: rasterize tile by tile straight into fileout (see RasterizeTiles),
+        the returned data is None, read fileout instead
+    :param workers: the number of worker processes of the tiled mode
     """
     #gdal.SetConfigOption("SHAPE_RESTORE_SHX", "YES")
     #gdal.SetConfigOption("SHAPE_ENCODING", "UTF-8")
-    burn_fieldname = burn_fieldname if burn_fieldname  else "FID"
+    specs = burn_specs(burn_fieldname, z_value, factor)
+    multiband = isinstance(burn_fieldname, list)
 
     #filedem = copy(filedem) if iss3(filedem) else filedem
     fileshp = copy(fileshp) if iss3(fileshp) else fileshp
-    fileshp = Transform(fileshp, filedem)
 
     ds = OpenRaster(filedem)
     vector = OpenShape(fileshp)
@@ -85,102 +309,69 @@ def RasterizeLike(fileshp, filedem, fileout="", dtype=None, burn_fieldname=None,
         nodata = band.GetNoDataValue() if nodata is None else nodata
         dtype = dtypeOf[dtype] if dtype else band.DataType
 
-        # Open the data source and read in the extent
-        # layer = vector.GetLayer()
-        # Instead of just get the layer we copy the layer on memory
-        # and we add a buffer and we transform each geometry
-        # if needed
-
-        vlayer = vector.GetLayer()
-        s_srs = GetSpatialRef(vlayer.GetSpatialRef())
-        t_srs = GetSpatialRef(prj)
-        driver = ogr.GetDriverByName("MEMORY")
-        source = driver.CreateDataSource("memData")
-        layer = source.CreateLayer(vlayer.GetName(), t_srs, geom_type=vlayer.GetGeomType())
-        # Copy the fields from the source layer to the memory layer
-        layer_defn = vlayer.GetLayerDefn()
-        for j in range(layer_defn.GetFieldCount()):
-            layer.CreateField(layer_defn.GetFieldDefn(j))
-        layer.CreateField(ogr.FieldDefn("FID", ogr.OFTInteger))
-        # Copy the features from the source layer to the memory layer
-
-        for feature in vlayer:
-
-            # f is the feature in the memory layer & it has FID field
-            f = ogr.Feature(layer.GetLayerDefn())
-            geom = feature.GetGeometryRef()
+        if tilesize and not fileout:
+            Logger.warning("RasterizeLike: tilesize needs a fileout, rasterizing in memory")
+        if tilesize and fileout:
+            # the workers open the same path as OpenShape, e.g. /vsicurl/ for http
+            fileshp = vector.GetName()
+            ds, vector = None, None
+            filetif = tempname4S3(fileout) if iss3(fileout) else fileout
+            if not RasterizeTiles(fileshp, filetif, m, n, gt, prj, dtype, nodata, specs, buf, all_touched,
+                                  tilesize=tilesize, workers=workers):
+                return None, None, None
+            if iss3(fileout):
+                move(filetif, fileout)
+            return None, gt, prj
 
-            # # Transform the geometry if it is not in the same projection as the raster
-            if not SameSpatialRef(s_srs, t_srs):
-                # Logger.debug(f"Transforming geometry from {s_srs} to {t_srs}")
-                transform = osr.CoordinateTransformation(s_srs, t_srs)
-                geom.Transform(transform)
-
-            # add buffer
-            # solo per i poligoni
-            if buf > 0 and geom.GetGeometryType() == ogr.wkbPolygon or geom.GetGeometryType() == ogr.wkbMultiPolygon:
-                buffer = geom.Buffer(buf)
-            else:
-                buffer = geom
-
-            f.SetFrom(feature)
-            f.SetGeometry(buffer)
-            f.SetField("FID", feature.GetFID())
-            for j in range(layer_defn.GetFieldCount()):
-                f.SetField(layer_defn.GetFieldDefn(j).GetNameRef(), feature.GetField(j))
-            layer.CreateFeature(f)
+        # Instead of just get the layer we copy the layer on memory,
+        # reprojected, buffered and with just the burn fields
+        source = rasterize_source(vector, prj, specs, buf)
+        if source is None:
+            return None, None, None
+        layer = source.GetLayer()
         #-----------------------------------------------------------------------
         # Create the destination data source
         options = [
             "BIGTIFF=YES", 
             "TILED=YES",
-            "BLOCKXSIZE=256", 
-            "BLOCKYSIZE=256", 
+            "BLOCKXSIZE=512", 
+            "BLOCKYSIZE=512", 
             "COMPRESS=LZW"
         ] if fileout else []
         format = "GTiff" if fileout else "MEM"
+        filetif = tempname4S3(fileout) if iss3(fileout) else fileout
+        if fileout:
+            os.makedirs(justpath(filetif) or ".", exist_ok=True)
         driver = gdal.GetDriverByName(format)
-        target_ds = driver.Create(fileout if fileout else "", n, m, 1, dtype, options)
+        target_ds = driver.Create(filetif if fileout else "", n, m, len(specs), dtype, options)
         if gt is not None:
             target_ds.SetGeoTransform(gt)
         if prj is not None:
             target_ds.SetProjection(prj)
-        band = target_ds.GetRasterBand(1)
-        band.SetNoDataValue(nodata)
-        band.Fill(nodata)
+        bands = [target_ds.GetRasterBand(k) for k in range(1, len(specs) + 1)]
+        for band in bands:
+            band.SetNoDataValue(nodata)
+            if not fileout:
+                band.Fill(nodata)
+        # GTiff blocks that are never written are read and saved as nodata,
+        # so the file is not filled and compressed twice
 
-        fieldnames = GetNumericFieldNames(fileshp)+["FID"]
         # Rasterize
-        if factor == 0.0:
-            # if factor is 0 then burn 0, may be this does not have much sense
-            gdal.RasterizeLayer(target_ds, [1], layer, burn_values=[0.0], options=[f"ALL_TOUCHED={all_touched}"])
-        elif burn_fieldname and burn_fieldname in fieldnames and factor==1.0 and z_value is None:
-            # if factor is 1 then burn the field value
-            gdal.RasterizeLayer(target_ds, [1], layer, options=[f"ATTRIBUTE={burn_fieldname.upper()}", f"ALL_TOUCHED={all_touched}"])
-        elif burn_fieldname and burn_fieldname in fieldnames and factor!=1.0:
-            # if factor is not 1 then burn the field value multiplied by factor
-            # in case of fieldname we have to pre multiply the each feature value by factor
-            # To not modify the original layer we have to copy it in memory
-            memds = ogr.GetDriverByName("Memory").CopyDataSource(vector, "tmp")
-            layercpy = memds.GetLayer()
-            for feature in layercpy:
-                feature.SetField(burn_fieldname, feature.GetField(burn_fieldname) * factor)
-                layercpy.SetFeature(feature)
-            gdal.RasterizeLayer(target_ds, [1], layercpy, options=["ATTRIBUTE=%s" % (burn_fieldname.upper()), f"ALL_TOUCHED={all_touched}"])
-            memds, layercpy = None, None
-        elif z_value is not None:
-            # in case we hav not fieldname we burn the z_value
-            gdal.RasterizeLayer(target_ds, [1], layer, burn_values=[z_value*factor], options=[f"ALL_TOUCHED={all_touched}"])
-        else:
-            # in all other cases we burn 1
-            gdal.RasterizeLayer(target_ds, [1], layer, burn_values=[1], options=[f"ALL_TOUCHED={all_touched}"])
-
-        data = band.ReadAsArray(0, 0, n, m)
+        burn_layer(target_ds, layer, specs, all_touched)
 
+        data = None
         if fileout:
-            Numpy2GTiff(data, gt, prj, fileout, save_nodata_as=nodata)
+            # finalize the file in place
+            for band in bands:
+                compute_statistics(band)
+        if return_array or not fileout:
+            data = target_ds.ReadAsArray(0, 0, n, m)
+            data = data.reshape(len(specs), m, n) if multiband else data
+        bands, band, target_ds = None, None, None
+        if fileout and iss3(fileout):
+            move(filetif, fileout)
 
-        ds, vector, target_ds = None, None, None
+        ds, vector, source = None, None, None
         return data, gt, prj
 
     Logger.error(f"file <{fileshp}> or <{filedem}> does not exist!")
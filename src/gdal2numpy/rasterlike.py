@@ -22,29 +22,138 @@
 #
 # Created:     16/06/2021
 # -------------------------------------------------------------------------------
+import os
 import numpy as np
-from .filesystem import tempfilename, remove
+from concurrent.futures import ProcessPoolExecutor
+from osgeo import gdal
+from .filesystem import tempfilename, remove, justpath, listify, now, total_seconds_from
 from .module_ogr import SamePixelSize, SameSpatialRef, GetSpatialRef, GetExtent, SameExtent
-from .module_ogr import Rectangle, GetPixelSize
-from .module_s3 import isfile, israster
-from .module_GDAL2Numpy import GDAL2Numpy
+from .module_ogr import Rectangle, GetPixelSize, DescribeRaster, RasterInfo
+from .module_s3 import isfile, israster, move
+from .module_open import OpenRaster
+from .module_GDAL2Numpy import GDAL2Numpy, resampling_method, translate_nodata, data_type_of
 from .module_Numpy2GTiff import Numpy2GTiff
 from .gdalwarp import gdalwarp
+from .module_tiles import worker_init
 from .module_log import Logger
-from .gdal_translate import gdal_translate
+from .gdal_translate import gdal_translate, dtypeOf
 
 # TODO: integrate RasterizeLike and RasterLike into a single function
 # def RasterizeLike(fileshp, filedem, fileout="",  burn_fieldname=None, z_value=None, factor=1.0, nodata=None, buf=0.0, all_touched=False):
 
+def WarpLike(filename, filetpl, fileout=None, dtype=None, resampleAlg="near", nodata=None, format="GTiff"):
+    """
+    WarpLike - crop, reproject and resample filename on the grid of filetpl
+    with a single gdal.Warp: outputBounds, width and height are the ones of
+    the template, no intermediate files are written
+    :param filetpl: the template file or its RasterInfo (see DescribeRaster)
+    :param fileout: the output file, None to warp into a MEM dataset
+    :return: the warped gdal.Dataset or None
+    """
+    co = {
+        "gtiff": ["BIGTIFF=YES", "TILED=YES", "BLOCKXSIZE=512", "BLOCKYSIZE=512", "COMPRESS=LZW"],
+        "cog":   ["BIGTIFF=YES", "COMPRESS=LZW"],
+    }
+    format = format.lower() if fileout and format else "mem"
+
+    info = filetpl if isinstance(filetpl, RasterInfo) else DescribeRaster(filetpl)
+    ds = OpenRaster(filename)
+    if not info or not ds:
+        Logger.error(f"file <{filename}> or <{filetpl}> does not exist!")
+        return None
+
+    m, n = info.shape
+    kwargs = {
+        "format": format,
+        "creationOptions": co.get(format, []),
+        "dstSRS": info.wkt,
+        "outputBounds": info.extent,
+        "width": n,
+        "height": m,
+        "resampleAlg": resampling_method(resampleAlg),
+        "multithread": True,
+    }
+    dtype = dtype.lower() if isinstance(dtype, str) else dtype
+    if dtype and dtype in dtypeOf:
+        kwargs["outputType"] = dtypeOf[dtype]
+    if nodata is not None:
+        kwargs["dstNodata"] = nodata
+
+    out = None
+    try:
+        gdal.UseExceptions()
+        gdal.PushErrorHandler('CPLQuietErrorHandler')
+        out = gdal.Warp(fileout if fileout else "", ds, **kwargs)
+    except Exception as ex:
+        Logger.error(ex)
+    finally:
+        gdal.PopErrorHandler()
+    ds = None
+    return out
+
+
+def RasterLikeArray(filename, filetpl, dtype=None, resampleAlg="near", nodata=None):
+    """
+    RasterLikeArray - the array of filename aligned to the grid of filetpl
+    :param dtype: a dtypeOf key, the array gets the matching numpy type
+    :return: data, gt, prj
+    """
+    dtype = dtype.lower() if isinstance(dtype, str) else dtype
+    # "byte" or gdal.GDT_Float32 are not numpy types, go through the gdal type
+    dtype = data_type_of[gdal.GetDataTypeName(dtypeOf[dtype])] if dtype in dtypeOf else np.float32
+    if not israster(filename):
+        Logger.error(f"file <{filename}> is not a raster!")
+        return None, None, None
+
+    if SameSpatialRef(filename, filetpl) and \
+        SamePixelSize(filename, filetpl, decimals=2) and \
+            SameExtent(filename, filetpl, decimals=3):
+        Logger.debug("Files have the same srs, pixels size and extent!")
+        return GDAL2Numpy(filename, band=1, dtype=dtype, load_nodata_as=np.nan)
+
+    info = DescribeRaster(filetpl)
+    if not info:
+        Logger.error(f"file <{filetpl}> does not exist!")
+        return None, None, None
+
+    tif_minx, tif_miny, tif_maxx, tif_maxy = GetExtent(filename, GetSpatialRef(filetpl))
+    tif_rectangle = Rectangle(tif_minx, tif_miny, tif_maxx, tif_maxy)
+    tpl_rectangle = Rectangle(*info.extent)
+    if not tif_rectangle.Intersects(tpl_rectangle):
+        # nothing to warp, the template grid is all nodata
+        Logger.debug("RasterLikeArray: empty intersection with the template")
+        data = np.empty(info.shape, dtype=dtype)
+        data.fill(np.nan if np.issubdtype(data.dtype, np.floating) else (nodata or 0))
+        return data, info.gt, info.wkt
+
+    ds = WarpLike(filename, filetpl, None, dtype=dtype, resampleAlg=resampleAlg, nodata=nodata)
+    if not ds:
+        return None, None, None
+    band = ds.GetRasterBand(1)
+    data = translate_nodata(band.ReadAsArray(), band.GetNoDataValue(), dtype, np.nan)
+    gt, prj = ds.GetGeoTransform(), ds.GetProjection()
+    band, ds = None, None
+    return data, gt, prj
+
+
 def RasterLike(filename, filetpl, fileout=None, dtype=None, resampleAlg="near",
                 nodata=None,
                 #burn_fieldname=None, z_value=None, factor=1.0, buf=0.0, all_touched=False,
                 format="GTiff",
+                pipeline="files",
+                return_array=False,
                 verbose=False):
     """
     RasterLike: adatta un raster al raster template ( dem ) ricampionando, 
     riproiettando estendendo/clippando il file raster se necessario.
+    :param pipeline: "files" crop, warp and crop through temporary GeoTIFFs,
+        "warp" aligns to the template grid with a single gdal.Warp (see WarpLike)
+    :param return_array: warp into a MEM dataset on the template grid and
+        return (data, gt, prj) with nodata as nan, nothing is written
     """
+    if return_array:
+        return RasterLikeArray(filename, filetpl, dtype=dtype, resampleAlg=resampleAlg, nodata=nodata)
+
     Logger.debug("0)RasterLike...")
     fileout = fileout if fileout else tempfilename(suffix=".tif")
 
@@ -57,6 +166,17 @@ def RasterLike(filename, filetpl, fileout=None, dtype=None, resampleAlg="near",
             fileout = filename
             return fileout
 
+        if pipeline == "warp":
+            filetmp = tempfilename(prefix="rasterlike/tmp_", suffix=".tif")
+            os.makedirs(justpath(filetmp), exist_ok=True)
+            ds = WarpLike(filename, filetpl, filetmp, dtype=dtype, resampleAlg=resampleAlg,
+                          nodata=nodata, format=format)
+            if ds:
+                # flush the dataset before moving it
+                ds = None
+                move(filetmp, fileout)
+            return fileout if isfile(fileout) else None
+
         srs_tpl = GetSpatialRef(filetpl)
         # Tiff extent
         tif_minx, tif_miny, tif_maxx, tif_maxy = GetExtent(filename, srs_tpl)
@@ -107,4 +227,74 @@ def RasterLike(filename, filetpl, fileout=None, dtype=None, resampleAlg="near",
 
         remove(file_warp1)
     
-    return fileout if isfile(fileout) else None
\ No newline at end of file
+    return fileout if isfile(fileout) else None
+
+
+def rasterlike_task(filename, tpl, fileout, dtype, resampleAlg, nodata, format):
+    """
+    rasterlike_task - warp a single file of RasterLikeMany on the template grid
+    :return: fileout, seconds
+    """
+    t0 = now()
+    try:
+        filetmp = tempfilename(prefix="rasterlike/tmp_", suffix=".tif")
+        os.makedirs(justpath(filetmp), exist_ok=True)
+        ds = WarpLike(filename, tpl, filetmp, dtype=dtype, resampleAlg=resampleAlg, nodata=nodata, format=format)
+        if ds:
+            ds = None
+            move(filetmp, fileout)
+        fileout = fileout if isfile(fileout) else None
+    except Exception as ex:
+        Logger.error(f"RasterLikeMany: {filename}: {ex}")
+        fileout = None
+    return fileout, total_seconds_from(t0)
+
+
+def RasterLikeMany(filenames, filetpl, fileouts=None, dtype=None, resampleAlg="near", nodata=None,
+                   format="GTiff", workers=4, cachemax=256):
+    """
+    RasterLikeMany - align many rasters to the same template in a process pool.
+    The template is described once, files that already have the srs, pixel
+    size and extent of the template are returned as they are.
+    :param fileouts: the output files, None for temporary files
+    :param workers: the number of processes, 1 runs in the current process
+    :param cachemax: the GDAL block cache of each worker in MB
+    :return: a list of (fileout, seconds) in the order of filenames
+    """
+    filenames = listify(filenames)
+    fileouts = listify(fileouts) if fileouts else [tempfilename(suffix=".tif") for _ in filenames]
+    if len(fileouts) != len(filenames):
+        Logger.error("RasterLikeMany: filenames and fileouts have different lengths")
+        return None
+
+    tpl = DescribeRaster(filetpl)
+    if not tpl:
+        Logger.error(f"file <{filetpl}> does not exist!")
+        return None
+
+    results = [None] * len(filenames)
+    tasks = []
+    for j, (filename, fileout) in enumerate(zip(filenames, fileouts)):
+        t0 = now()
+        if not israster(filename):
+            Logger.error(f"file <{filename}> is not a raster!")
+            results[j] = (None, total_seconds_from(t0))
+        elif SameSpatialRef(filename, filetpl) and \
+            SamePixelSize(filename, filetpl, decimals=2) and \
+                SameExtent(filename, filetpl, decimals=3):
+            Logger.debug(f"{filename} has the same srs, pixels size and extent!")
+            results[j] = (filename, total_seconds_from(t0))
+        else:
+            tasks.append((j, (filename, tpl, fileout, dtype, resampleAlg, nodata, format)))
+
+    if workers and workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=worker_init, initargs=(cachemax,)) as executor:
+            futures = [(j, executor.submit(rasterlike_task, *args)) for j, args in tasks]
+            for j, future in futures:
+                results[j] = future.result()
+    else:
+        for j, args in tasks:
+            results[j] = rasterlike_task(*args)
+
+    return results
+
@@ -0,0 +1,90 @@
+import os
+import time
+import resource
+import multiprocessing
+import numpy as np
+from gdal2numpy import *
+
+workdir = justpath(__file__)
+
+# 16384 x 16384 Float32 = 1 GB
+ROWS, COLS = 16384, 16384
+NODATA = -9999
+
+
+def legacy_translate_nodata(data, no_data, band_type, dtype=np.float32, load_nodata_as=np.nan):
+    """
+    legacy_translate_nodata - the nodata translation before the single-pass rewrite
+    """
+    if not np.isnan(load_nodata_as):
+        data[np.isnan(data)] = load_nodata_as
+    if dtype and dtype != band_type:
+        data = data.astype(dtype, copy=False)
+    if band_type in (np.uint8, np.int16, np.uint16, np.int32, np.uint32):
+        if no_data != load_nodata_as:
+            data[data == no_data] = load_nodata_as
+    return data
+
+
+def peak_rss():
+    """
+    peak_rss - the peak resident set size of the process in MB
+    """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run(name, queue):
+    """
+    run - translate a Int16 tile to Float32 and report time and peak memory
+    """
+    data = np.random.randint(-100, 100, size=(ROWS, COLS), dtype=np.int16)
+    data[::7, ::7] = NODATA
+    rss0 = peak_rss()
+    t0 = time.perf_counter()
+    if name == "legacy":
+        data = legacy_translate_nodata(data, float(NODATA), np.int16, np.float32, np.nan)
+    else:
+        data = translate_nodata(data, float(NODATA), np.float32, np.nan)
+    queue.put((name, time.perf_counter() - t0, peak_rss() - rss0))
+
+
+def bench_translate_nodata():
+    """
+    bench_translate_nodata - compare the legacy and the single-pass nodata translation,
+    each variant runs in a fresh process and reports its wall time (perf_counter)
+    and the growth of its peak RSS (getrusage). Run it with an installed GDAL:
+        python tests/benchmark_gdal2numpy.py
+    """
+    queue = multiprocessing.Queue()
+    for name in ("legacy", "single-pass"):
+        # run each variant in a fresh process to measure its own peak RSS
+        p = multiprocessing.Process(target=run, args=(name, queue))
+        p.start()
+        p.join()
+        name, seconds, mb = queue.get()
+        print(f"{name:<12} {seconds:8.2f}s  peak +{mb:8.1f} MB")
+
+
+def bench_num_threads(size=20000):
+    """
+    bench_num_threads - read a LZW compressed size x size GTiff with 1, 4, 8 and 16 threads
+    """
+    filetif = f"{tempdir()}/bench_{size}x{size}.tif"
+    if not os.path.isfile(filetif):
+        data = np.random.rand(size, size).astype(np.float32)
+        data[::7, ::7] = NODATA
+        gt = (0, 1, 0, size, 0, -1)
+        Numpy2GTiff(data, gt, "EPSG:3857", filetif, save_nodata_as=NODATA)
+        data = None
+
+    for num_threads in (1, 4, 8, 16):
+        t0 = time.perf_counter()
+        data, _, _ = GDAL2Numpy(filetif, load_nodata_as=np.nan, num_threads=num_threads)
+        print(f"num_threads={num_threads:<3} {time.perf_counter() - t0:8.2f}s")
+        data = None
+    remove(filetif)
+
+
+if __name__ == '__main__':
+    bench_translate_nodata()
+    bench_num_threads()
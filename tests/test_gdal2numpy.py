@@ -33,6 +33,87 @@ class Test(unittest.TestCase):
         self.assertTrue(data.size>0)
 
 
+    def test_tiles(self):
+        """
+        test_tiles: 
+        """
+        data, _, _ = GDAL2Numpy(filedem, load_nodata_as=np.nan)
+        mosaic = np.full(data.shape, np.nan, dtype=np.float32)
+        for tile, (j0, i0, cols, rows), _ in GDAL2NumpyTiles(filedem, tilesize=256, halo=2):
+            mosaic[i0:i0 + rows, j0:j0 + cols] = tile
+        self.assertTrue(np.array_equal(data, mosaic, equal_nan=True))
+
+
+    def test_out(self):
+        """
+        test_out: 
+        """
+        data, _, _ = GDAL2Numpy(filedem, load_nodata_as=np.nan)
+        m, n = data.shape
+        mosaic = np.zeros((m, 2 * n), dtype=np.float32)
+        res, _, _ = GDAL2Numpy(filedem, load_nodata_as=np.nan, out=mosaic[:, n:])
+        self.assertTrue(np.shares_memory(res, mosaic))
+        self.assertTrue(np.array_equal(mosaic[:, n:], data, equal_nan=True))
+
+
+    def test_decimated(self):
+        """
+        test_decimated: 
+        """
+        data, gt, _ = GDAL2Numpy(filedem, load_nodata_as=np.nan)
+        m, n = data.shape
+        preview, gt2, _ = GDAL2Numpy(filedem, out_shape=(m // 4, n // 4), resampleAlg="average")
+        self.assertEqual(preview.shape, (m // 4, n // 4))
+        self.assertAlmostEqual(gt2[1], gt[1] * n / (n // 4))
+
+
+    def test_multiband(self):
+        """
+        test_multiband: 
+        """
+        data, _, _ = GDAL2Numpy(filedem, load_nodata_as=np.nan)
+        stack, _, _ = GDAL2Numpy(filedem, band="all", load_nodata_as=np.nan)
+        self.assertEqual(stack.shape, (1,) + data.shape)
+        self.assertTrue(np.array_equal(stack[0], data, equal_nan=True))
+
+
+    def test_num_threads(self):
+        """
+        test_num_threads: 
+        """
+        data, _, _ = GDAL2Numpy(filedem, load_nodata_as=np.nan)
+        data4, _, _ = GDAL2Numpy(filedem, load_nodata_as=np.nan, num_threads=4)
+        self.assertTrue(np.array_equal(data, data4, equal_nan=True))
+
+
+    def test_lazy_raster(self):
+        """
+        test_lazy_raster: 
+        """
+        data, gt, _ = GDAL2Numpy(filedem, load_nodata_as=np.nan)
+        with Raster(filedem, cache=16) as r:
+            self.assertEqual(r.shape, data.shape)
+            self.assertEqual(r.gt, gt)
+            self.assertTrue(np.array_equal(r[100:300, 50:90], data[100:300, 50:90], equal_nan=True))
+            self.assertTrue(np.array_equal(r[-1], data[-1], equal_nan=True))
+
+
+    def test_mmap(self):
+        """
+        test_mmap: 
+        """
+        data, gt, prj = GDAL2Numpy(filedem, load_nodata_as=np.nan)
+        Numpy2GTiff(data, gt, prj, fileout, save_nodata_as=-9999, layout="mmap")
+        mapped, _, _ = GDAL2Numpy(fileout, load_nodata_as=np.nan, mmap=True)
+        self.assertTrue(isinstance(mapped, np.memmap))
+        self.assertTrue(np.array_equal(mapped, data, equal_nan=True))
+        mapped = None
+        os.remove(fileout)
+        # multi-band arrays are rejected instead of failing on the unpacking
+        self.assertIsNone(Numpy2GTiff(np.stack([data, data]), gt, prj, fileout, layout="mmap"))
+        self.assertFalse(os.path.isfile(fileout))
+
+
     def test_s3(self):
         """
         test_save: 
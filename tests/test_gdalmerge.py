@@ -1,5 +1,6 @@
 import os,warnings
 import unittest
+from osgeo import gdal
 from gdal2numpy import *
 import inspect
 
@@ -48,6 +49,50 @@ class Test(unittest.TestCase):
         fileout = gdal_merge([file1, file2], fileout)
         #gdal.BuildVRT(f"{wkdir}/tmp.vrt", [file1, file2], **{"srcNodata": -9999, "VRTNodata": -9999, "resampleAlg": "hello"})
 
+    def test_gdal_merge_methods(self):
+        """
+        test_gdal_merge_methods: first/last/min/max/mean of two overlapping tiles
+        """
+        gt1, gt2 = (0, 1, 0, 2, 0, -1), (1, 1, 0, 2, 0, -1)
+        data1 = np.array([[1, 2, -9999], [4, 5, 6]], dtype=np.float32)
+        data2 = np.array([[10, 20], [30, -9999]], dtype=np.float32)
+        file1, file2 = f"{workdir}/merge1.tif", f"{workdir}/merge2.tif"
+        fileout = f"{workdir}/merge12.tif"
+        Numpy2GTiff(data1, gt1, "EPSG:3857", file1, save_nodata_as=-9999)
+        Numpy2GTiff(data2, gt2, "EPSG:3857", file2, save_nodata_as=-9999)
+        expected = {
+            "first": [[1, 2, 20], [4, 5, 6]],
+            "last": [[1, 10, 20], [4, 30, 6]],
+            "min": [[1, 2, 20], [4, 5, 6]],
+            "max": [[1, 10, 20], [4, 30, 6]],
+            "mean": [[1, 6, 20], [4, 17.5, 6]],
+        }
+        for method, values in expected.items():
+            gdal_merge([file1, file2], fileout, method=method)
+            data, _, _ = GDAL2Numpy(fileout, load_nodata_as=np.nan)
+            self.assertTrue(np.array_equal(data, np.array(values, dtype=np.float32)), method)
+        remove([file1, file2, fileout])
+
+    def test_gdal_merge_inputs(self):
+        """
+        test_gdal_merge_inputs: vrt inputs are merged, multi-band inputs are rejected
+        """
+        gt1, gt2 = (0, 1, 0, 2, 0, -1), (1, 1, 0, 2, 0, -1)
+        data1 = np.array([[1, 2, -9999], [4, 5, 6]], dtype=np.float32)
+        data2 = np.array([[10, 20], [30, -9999]], dtype=np.float32)
+        file1, file2 = f"{workdir}/merge1.tif", f"{workdir}/merge2.tif"
+        filevrt, filemulti = f"{workdir}/merge1.vrt", f"{workdir}/merge_multi.tif"
+        fileout = f"{workdir}/merge12.tif"
+        Numpy2GTiff(data1, gt1, "EPSG:3857", file1, save_nodata_as=-9999)
+        Numpy2GTiff(data2, gt2, "EPSG:3857", file2, save_nodata_as=-9999)
+        gdal.BuildVRT(filevrt, [file1])
+        self.assertEqual(gdal_merge([filevrt, file2], fileout, method="first"), fileout)
+        data, _, _ = GDAL2Numpy(fileout, load_nodata_as=np.nan)
+        self.assertTrue(np.array_equal(data, np.array([[1, 2, 20], [4, 5, 6]], dtype=np.float32)))
+        gdal.Translate(filemulti, file2, bandList=[1, 1])
+        self.assertIsNone(gdal_merge([file1, filemulti], fileout))
+        remove([file1, file2, filevrt, filemulti, fileout])
+
         
 
 
@@ -1,5 +1,7 @@
 import os,warnings
+import tempfile
 import unittest
+from osgeo import gdal
 from gdal2numpy import *
 
 workdir = justpath(__file__)
@@ -83,6 +85,55 @@ class Test(unittest.TestCase):
         fileout = f"{workdir}/12_2k_0015_0016.tif"
         gdalwarp([file1, file2], fileout, dstSRS=filedem, format="GTiff") #, cutline=[783785, 4885325 , 784795, 4886006])
 
+    def test_gdalwarp_inplace_s3(self):
+        """
+        test_gdalwarp_inplace_s3: the s3 input is read with range reads, not downloaded
+        """
+        filedem = f"s3://saferplaces.co/test/lidar_rimini_building_2_wd.tif"
+        fileout = f"{workdir}/lidar_rimini_building_2_wd.3857.tif"
+        paths, copies = GDALPaths([filedem])
+        self.assertEqual(paths, ["/vsis3/saferplaces.co/test/lidar_rimini_building_2_wd.tif"])
+        self.assertEqual(copies, [])
+        gdalwarp(filedem, fileout, dstSRS=3857, vsi_cache=64 * 1024 * 1024)
+        self.assertTrue(isfile(fileout))
+        self.assertFalse(os.path.isfile(tempname4S3(filedem)))
+        os.remove(fileout)
+
+    def test_gdalwarp_tiles(self):
+        """
+        test_gdalwarp_tiles: the tiled warp matches the single exact warp
+        """
+        file1 = f"{workdir}/12_2k_0015.tif"
+        fileout1 = f"{workdir}/12_2k_0015.3857.tif"
+        fileout2 = f"{workdir}/12_2k_0015.3857.tiles.tif"
+        gdal.Warp(fileout1, file1, dstSRS="EPSG:3857", errorThreshold=0)
+        gdalwarp(file1, fileout2, dstSRS=3857, tilesize=256, workers=4)
+        data1, gt1, _ = GDAL2Numpy(fileout1)
+        data2, gt2, _ = GDAL2Numpy(fileout2)
+        self.assertEqual(data1.shape, data2.shape)
+        self.assertTrue(np.allclose(gt1, gt2))
+        self.assertTrue(np.allclose(data1, data2, equal_nan=True))
+        # the tiles and their folder are removed
+        self.assertFalse(os.path.isdir(f"{tempfile.gettempdir()}/gdalwarp/{juststem(fileout2)}_tiles"))
+        os.remove(fileout1)
+        os.remove(fileout2)
+
+    def test_warp_to_array(self):
+        """
+        test_warp_to_array: the in memory warp matches the warped file
+        """
+        file1 = f"{workdir}/12_2k_0015.tif"
+        fileout = f"{workdir}/12_2k_0015.3857.tif"
+        gdalwarp(file1, fileout, dstSRS=3857)
+        data1, gt1, _ = GDAL2Numpy(fileout)
+        data2, gt2, prj2 = WarpToArray(file1, dstSRS=3857)
+        data3, _, _ = gdalwarp(file1, dstSRS=3857, return_array=True)
+        self.assertTrue(np.allclose(gt1, gt2))
+        self.assertTrue(SameSpatialRef(prj2, 3857))
+        self.assertTrue(np.allclose(data1, data2, equal_nan=True))
+        self.assertTrue(np.allclose(data2, data3, equal_nan=True))
+        os.remove(fileout)
+
     # def test_if_is_cog(self):
     #     """
     #     test_if_is_cog
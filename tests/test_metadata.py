@@ -1,4 +1,6 @@
+import os
 import unittest
+from osgeo import gdal
 from gdal2numpy import *
 
 workdir = justpath(__file__)
@@ -25,6 +27,39 @@ class TestMetadata(unittest.TestCase):
         tag = "dtm"
         SetTag(filetif, "type", tag)
         self.assertEqual(GetTag(filetif, "type"), tag)
+
+    def test_fix_nodata(self):
+        """
+        test_fix_nodata: the nodata is rewritten in place block by block
+        """
+        fileout = f"{workdir}/fix_nodata.tif"
+        data = np.arange(600 * 700, dtype=np.float32).reshape(600, 700)
+        data[0, 0], data[599, 699], data[300, 300] = -9999, np.nan, 1e20
+        # a cell already equal to the new nodata
+        data[2, 2] = -1
+        Numpy2GTiff(data, (0, 1, 0, 600, 0, -1), "EPSG:3857", fileout, save_nodata_as=-9999)
+        GDALFixNoData(fileout, nodata=-1)
+        self.assertEqual(GetNoData(fileout), -1)
+        res, _, _ = GDAL2Numpy(fileout, load_nodata_as=-1)
+        self.assertEqual(res[0, 0], -1)
+        self.assertEqual(res[599, 699], -1)
+        self.assertEqual(res[300, 300], -1)
+        self.assertEqual(res[1, 1], data[1, 1])
+        # the nodata cells are left out of the statistics
+        ds = gdal.Open(fileout)
+        self.assertEqual(ds.GetRasterBand(1).GetMinimum(), 1)
+        ds = None
+        # the compressed file is copied, it does not grow at every call
+        size = os.path.getsize(fileout)
+        GDALFixNoData(fileout, nodata=-2)
+        GDALFixNoData(fileout, nodata=-1)
+        self.assertTrue(os.path.getsize(fileout) <= size * 1.01)
+        os.remove(fileout)
+        # -9999 does not fit a Byte band
+        Numpy2GTiff(np.ones((10, 10), dtype=np.uint8), (0, 1, 0, 10, 0, -1), "EPSG:3857", fileout, save_nodata_as=0)
+        self.assertFalse(GDALFixNoData(fileout, nodata=-9999))
+        self.assertEqual(GetNoData(fileout), 0)
+        os.remove(fileout)
    
     
 
@@ -15,6 +15,33 @@ class TestOGR(unittest.TestCase):
         print(srs)
         self.assertTrue(srs is not None)
 
+    def test_TransformPoints(self):
+        """
+        test_TransformPoints: the vectorized transform matches TransformBBOX
+        """
+        xs = np.array([12.0, 12.5, 13.0])
+        ys = np.array([43.0, 43.5, 44.0])
+        tx, ty = TransformPoints(xs, ys, 4326, 3857)
+        self.assertEqual(tx.shape, xs.shape)
+        minx, miny, _, _ = TransformBBOX((12.0, 43.0, 12.0, 43.0), 4326, 3857)
+        self.assertAlmostEqual(tx[0], minx, places=3)
+        self.assertAlmostEqual(ty[0], miny, places=3)
+        # the transformation is reused
+        self.assertIs(GetTransformation(4326, 3857), GetTransformation("EPSG:4326", "EPSG:3857"))
+
+    def test_TransformationAxisMapping(self):
+        """
+        test_TransformationAxisMapping: a srs with swapped axes gets its own transformation
+        """
+        srs1 = GetSpatialRef(3035)
+        srs1.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+        srs2 = GetSpatialRef(3035)
+        srs2.SetAxisMappingStrategy(osr.OAMS_AUTHORITY_COMPLIANT)
+        tx1, ty1 = TransformPoints(np.array([12.0]), np.array([43.0]), 4326, srs1)
+        tx2, ty2 = TransformPoints(np.array([12.0]), np.array([43.0]), 4326, srs2)
+        self.assertAlmostEqual(tx1[0], ty2[0], places=3)
+        self.assertAlmostEqual(ty1[0], tx2[0], places=3)
+
 
     
 
@@ -35,6 +35,23 @@ class Test(unittest.TestCase):
         self.assertTrue(ds is not None)
         self.assertEqual(ds.RasterCount, 1)
 
+    def test_dataset_pool(self):
+        """
+        test_dataset_pool: 
+        """
+        RASTER_INFO_CACHE.clear()
+        with DatasetPool(maxsize=8) as pool:
+            # the header is read once, then served by RASTER_INFO_CACHE
+            GetPixelSize(filetif)
+            GetExtent(filetif)
+            # these open the dataset again, through the pool
+            IsValid(filetif)
+            OpenRaster(filetif)
+            stats = pool.stats()
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["hits"], 2)
+        self.assertEqual(len(pool), 0)
+
     def test_opentext(self):
         """
         test_opentext: 
@@ -59,6 +59,28 @@ class Test(unittest.TestCase):
         self.assertEqual(metadata["metadata"]["type"], "DTM")
         self.assertEqual(metadata["metadata"]["UM"], "meters")
         self.assertEqual(data.shape, cog.shape)
+
+    def test_describe_raster(self):
+        """
+        test_describe_raster:
+        """
+        info = DescribeRaster(filetif)
+        self.assertEqual(info.shape, (1375, 1330))
+        self.assertEqual(info.pixelsize, (1.0, 1.0))
+        self.assertEqual(GetRasterShape(filetif), info.shape)
+        self.assertEqual(GetTransform(filetif), info.gt)
+        with self.assertRaises(AttributeError):
+            info.shape = (0, 0)
+        # the second call is served by the cache
+        hits = RASTER_INFO_CACHE.stats()["hits"]
+        GetPixelSize(filetif)
+        self.assertEqual(RASTER_INFO_CACHE.stats()["hits"], hits + 1)
+        # an expired remote entry is checked on the server and kept if unchanged
+        cache = FileCache(maxsize=8, ttl=0)
+        cache.get(filetif, lambda: ReadRasterInfo(filetif))
+        cache.get(filetif, lambda: ReadRasterInfo(filetif))
+        self.assertEqual(cache.stats()["misses"], 1)
+        self.assertEqual(cache.stats()["hits"], 1)
         
 
 if __name__ == '__main__':
@@ -47,6 +47,115 @@ class Test(unittest.TestCase):
         print(np.unique(data))
     
 
+    def test_rasterize_factor(self):
+        """
+        test_rasterize_factor: the burn field is premultiplied by factor
+        """
+        fileshp = f"{workdir}/test_building.shp"
+        filedem = f"{workdir}/test_river.tif"
+        data1, _, _ = RasterizeLike(fileshp, filedem, nodata=0)
+        data2, _, _ = RasterizeLike(fileshp, filedem, factor=2.0, nodata=0)
+        self.assertTrue(np.array_equal(data1 * 2, data2))
+
+    def test_rasterize_buffer_srs(self):
+        """
+        test_rasterize_buffer_srs: buf is in the units of the template whatever the srs of the shapefile
+        """
+        fileshp = f"{workdir}/test_building.shp"
+        filedem = f"{workdir}/test_river.tif"
+        filemetric = Transform(fileshp, filedem, f"{workdir}/test_building.tpl.shp")
+        filedegree = Transform(fileshp, 4326, f"{workdir}/test_building.4326.shp")
+        self.assertFalse(SameSpatialRef(filedegree, filedem))
+        data1, _, _ = RasterizeLike(filemetric, filedem, buf=2.0, nodata=0, z_value=1)
+        data2, _, _ = RasterizeLike(filedegree, filedem, buf=2.0, nodata=0, z_value=1)
+        unbuffered, _, _ = RasterizeLike(filedegree, filedem, nodata=0, z_value=1)
+        self.assertTrue(np.sum(data2) > np.sum(unbuffered))
+        # same footprint up to the reprojection round off, not 2 degrees wider
+        self.assertTrue(np.mean(data1 != data2) < 0.01)
+        # Transform returns fileshp itself when it is already in the template srs
+        for filename in {filemetric, filedegree} - {fileshp}:
+            for ext in ("shp", "shx", "dbf", "prj", "cpg"):
+                if os.path.isfile(forceext(filename, ext)):
+                    os.remove(forceext(filename, ext))
+
+    def test_rasterize_tiles(self):
+        """
+        test_rasterize_tiles: the tiled rasterization matches the full one
+        """
+        fileshp = f"{workdir}/test_building.shp"
+        filedem = f"{workdir}/test_river.tif"
+        # the output folder is created as in the single-pass mode
+        fileout = f"{workdir}/tiled/test_building_tiled.tif"
+        data, _, _ = RasterizeLike(fileshp, filedem, nodata=0)
+        for workers in (1, 2):
+            RasterizeLike(fileshp, filedem, fileout=fileout, nodata=0, tilesize=256, workers=workers)
+            tiled, _, _ = GDAL2Numpy(fileout, dtype=None, load_nodata_as=0)
+            self.assertTrue(np.array_equal(data, tiled))
+        # the workers filter the features of their tiles in the srs of the shapefile
+        filedegree = Transform(fileshp, 4326, f"{workdir}/test_building.4326.shp")
+        data, _, _ = RasterizeLike(filedegree, filedem, nodata=0, buf=2.0)
+        RasterizeLike(filedegree, filedem, fileout=fileout, nodata=0, buf=2.0, tilesize=256, workers=2)
+        tiled, _, _ = GDAL2Numpy(fileout, dtype=None, load_nodata_as=0)
+        self.assertTrue(np.array_equal(data, tiled))
+        os.remove(fileout)
+        os.rmdir(justpath(fileout))
+        for ext in ("shp", "shx", "dbf", "prj", "cpg"):
+            if os.path.isfile(forceext(filedegree, ext)):
+                os.remove(forceext(filedegree, ext))
+
+    def test_rasterize_fileout(self):
+        """
+        test_rasterize_fileout: the file is written once and matches the array
+        """
+        fileshp = f"{workdir}/test_building.shp"
+        filedem = f"{workdir}/test_river.tif"
+        fileout = f"{workdir}/test_building_once.tif"
+        data, _, _ = RasterizeLike(fileshp, filedem, nodata=0)
+        nothing, _, _ = RasterizeLike(fileshp, filedem, fileout=fileout, nodata=0, return_array=False)
+        written, _, _ = GDAL2Numpy(fileout, dtype=None, load_nodata_as=0)
+        self.assertIsNone(nothing)
+        self.assertTrue(np.array_equal(data, written))
+        os.remove(fileout)
+
+    def test_rasterize_disjoint(self):
+        """
+        test_rasterize_disjoint: a vector outside the template gives an all nodata file
+        """
+        filedem = f"{workdir}/test_river.tif"
+        fileshp = f"{workdir}/test_far_away.shp"
+        fileout = f"{workdir}/test_far_away.tif"
+        minx, miny, maxx, maxy = GetExtent(filedem)
+        driver = ogr.GetDriverByName("ESRI Shapefile")
+        ds = driver.CreateDataSource(fileshp)
+        layer = ds.CreateLayer("test_far_away", GetSpatialRef(filedem), ogr.wkbPolygon)
+        feature = ogr.Feature(layer.GetLayerDefn())
+        x0, y0 = maxx + 1000, maxy + 1000
+        feature.SetGeometry(ogr.CreateGeometryFromWkt(f"POLYGON(({x0} {y0},{x0+10} {y0},{x0+10} {y0+10},{x0} {y0+10},{x0} {y0}))"))
+        layer.CreateFeature(feature)
+        feature, layer, ds = None, None, None
+        # the exceptions are left on by gdalwarp and gdal_merge
+        gdal.UseExceptions()
+        for tilesize in (None, 256):
+            RasterizeLike(fileshp, filedem, fileout=fileout, nodata=0, tilesize=tilesize)
+            data, _, _ = GDAL2Numpy(fileout, dtype=None, load_nodata_as=0)
+            self.assertTrue(np.all(data == 0))
+        os.remove(fileout)
+        for ext in ("shp", "shx", "dbf", "prj"):
+            os.remove(forceext(fileshp, ext))
+
+    def test_rasterize_multiband(self):
+        """
+        test_rasterize_multiband: several burn specs in a single pass
+        """
+        fileshp = f"{workdir}/test_building.shp"
+        filedem = f"{workdir}/test_river.tif"
+        fid, _, _ = RasterizeLike(fileshp, filedem, nodata=0)
+        ones, _, _ = RasterizeLike(fileshp, filedem, z_value=10, nodata=0)
+        data, _, _ = RasterizeLike(fileshp, filedem, burn_fieldname=["FID", (10, 1.0)], nodata=0)
+        self.assertEqual(data.shape, (2,) + fid.shape)
+        self.assertTrue(np.array_equal(data[0], fid))
+        self.assertTrue(np.array_equal(data[1], ones))
+
     def test_gdalwarp(self):
         """
         test_rasterlike  
@@ -27,6 +27,62 @@ class Test(unittest.TestCase):
         self.assertEqual(GetPixelSize(fileout), GetPixelSize(filedem))
         self.assertEqual(GetSpatialRef(fileout).ExportToProj4(), GetSpatialRef(filedem).ExportToProj4())
 
+    def test_warp_pipeline(self):
+        """
+        test_warp_pipeline: a single gdal.Warp on the template grid
+        """
+        filerain = "s3://saferplaces.co/Venezia/COSMO-2I_tp/2024-09-18/00-00/forecast_acc_6h_2024-09-18_00-00_13h-18h.tif"
+        filedem =  "s3://saferplaces.co/Venezia/dtm_bacino3.bld.tif"
+        fileout = f"crop_warp.tif"
+
+        fileout = RasterLike(filerain, filedem, fileout, format="GTiff", pipeline="warp")
+
+        self.assertTrue(os.path.exists(fileout))
+        self.assertEqual(GetRasterShape(fileout), GetRasterShape(filedem))
+        self.assertEqual(GetTransform(fileout), GetTransform(filedem))
+        os.remove(fileout)
+
+    def test_return_array(self):
+        """
+        test_return_array: align into the template grid without writing files
+        """
+        filerain = "s3://saferplaces.co/Venezia/COSMO-2I_tp/2024-09-18/00-00/forecast_acc_6h_2024-09-18_00-00_13h-18h.tif"
+        filedem =  "s3://saferplaces.co/Venezia/dtm_bacino3.bld.tif"
+
+        data, gt, prj = RasterLike(filerain, filedem, return_array=True)
+
+        self.assertEqual(data.shape, GetRasterShape(filedem))
+        self.assertEqual(gt, GetTransform(filedem))
+        self.assertEqual(data.dtype, np.float32)
+
+    def test_return_array_dtype(self):
+        """
+        test_return_array_dtype: the gdal type names map to the numpy types
+        """
+        filerain = "s3://saferplaces.co/Venezia/COSMO-2I_tp/2024-09-18/00-00/forecast_acc_6h_2024-09-18_00-00_13h-18h.tif"
+        filedem =  "s3://saferplaces.co/Venezia/dtm_bacino3.bld.tif"
+
+        for dtype, expected in (("byte", np.uint8), ("Float32", np.float32), ("float64", np.float64)):
+            data, _, _ = RasterLike(filerain, filedem, dtype=dtype, return_array=True)
+            self.assertEqual(data.dtype, expected)
+
+    def test_rasterlike_many(self):
+        """
+        test_rasterlike_many: align many files to the same template
+        """
+        filerain = "s3://saferplaces.co/Venezia/COSMO-2I_tp/2024-09-18/00-00/forecast_acc_6h_2024-09-18_00-00_13h-18h.tif"
+        filedem =  "s3://saferplaces.co/Venezia/dtm_bacino3.bld.tif"
+
+        results = RasterLikeMany([filerain, filedem, filerain], filedem, workers=2)
+
+        self.assertEqual(len(results), 3)
+        # the template itself is not warped
+        self.assertEqual(results[1][0], filedem)
+        for fileout, seconds in (results[0], results[2]):
+            self.assertTrue(os.path.exists(fileout))
+            self.assertEqual(GetRasterShape(fileout), GetRasterShape(filedem))
+            os.remove(fileout)
+
 
 
     # def test_rasterlike_3857(self):
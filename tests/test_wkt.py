@@ -38,6 +38,45 @@ class Test(unittest.TestCase):
         code = AutoIdentify(fileshp)
         self.assertEqual(code, "EPSG:4326")
 
+    def test_SrsIndex(self):
+        """
+        test_SrsIndex
+        """
+        # an Esri-only wkt, pyproj finds no EPSG code so just the index resolves it
+        wkt = 'PROJCS["World_Mollweide",GEOGCS["GCS_WGS_1984",DATUM["D_WGS_1984",' \
+              'SPHEROID["WGS_1984",6378137.0,298.257223563]],PRIMEM["Greenwich",0.0],' \
+              'UNIT["Degree",0.0174532925199433]],PROJECTION["Mollweide"],PARAMETER["False_Easting",0.0],' \
+              'PARAMETER["False_Northing",0.0],PARAMETER["Central_Meridian",0.0],UNIT["Meter",1.0]]'
+        self.assertIsNone(CRS.from_wkt(wkt).to_epsg())
+        self.assertEqual(SRS_INDEX.get("hashes").get(SRS_INDEX.hash(wkt)), "Esri:54009")
+        self.assertEqual(AutoIdentify(wkt), "Esri:54009")
+        tables = SRS_INDEX.tables
+        # the second lookup is served by the memo
+        self.assertEqual(SRS_INDEX.recall(wkt), "Esri:54009")
+        self.assertEqual(AutoIdentify(wkt), "Esri:54009")
+        self.assertIs(SRS_INDEX.tables, tables)
+        # the memo is bounded
+        index = SrsIndex(maxsize=2)
+        for k in range(3):
+            index.remember(f"wkt{k}", f"EPSG:{k}")
+        self.assertEqual(len(index.identified), 2)
+        self.assertIsNone(index.recall("wkt0"))
+
+    def test_SpatialRefRegistry(self):
+        """
+        test_SpatialRefRegistry
+        """
+        srs = GetSpatialRef("EPSG:26914")
+        srs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+        # callers get a copy, the canonical srs is untouched
+        self.assertIsNot(GetSpatialRef(26914), srs)
+        GetSpatialRef(4326)
+        hits = SPATIAL_REFS.stats()["hits"]
+        self.assertTrue(SameSpatialRef(filetif, 26914))
+        self.assertTrue(SameSpatialRef(fileshp, "EPSG:4326"))
+        self.assertFalse(SameSpatialRef(filetif, fileshp))
+        self.assertEqual(SPATIAL_REFS.stats()["hits"], hits + 2)
+
 
 if __name__ == '__main__':
     unittest.main()